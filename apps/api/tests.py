@@ -0,0 +1,195 @@
+import json
+import threading
+import time
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils.http import http_date
+
+from apps.jobs.queue import run_pending
+from apps.tweet.models import Like, Post
+from apps.tweet.notify import new_posts
+from apps.tweet.timeline import fan_out_post
+from apps.users.models import Follow, User
+
+
+class ApiTests(TestCase):
+
+    def setUp(self):
+        self.user1 = User.objects.create_user('foo1', 'foo1@example.com', 'testpassword')
+        self.user2 = User.objects.create_user('foo2', 'foo2@example.com', 'testpassword')
+        Follow.objects.follow(self.user1, self.user2)
+        self.tweet1 = Post.objects.create(title='test1', content='content1', user=self.user2)
+        self.tweet2 = Post.objects.create(title='test2', content='content2', user=self.user2)
+        fan_out_post(self.tweet1)
+        fan_out_post(self.tweet2)
+        Like.objects.like(self.user1, self.tweet1.pk)
+        self.client.login(username='foo1', password='testpassword')
+
+    def test_login_required(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('apps.api:timeline')).status_code, 403)
+
+    def test_timeline(self):
+        response = self.client.get(reverse('apps.api:timeline'))
+        data = json.loads(response.content)
+        self.assertEqual([post['post_pk'] for post in data['posts']], [self.tweet2.pk, self.tweet1.pk])
+        self.assertEqual(data['posts'][1], {
+            'post_pk': self.tweet1.pk,
+            'username': 'foo2',
+            'title': 'test1',
+            'content': 'content1',
+            'created_at': data['posts'][1]['created_at'],
+            'likes_count': 1,
+            'liked': True,
+        })
+        self.assertIsNone(data['next_cursor'])
+
+    def test_timeline_not_modified(self):
+        url = reverse('apps.api:timeline')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(4):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        Like.objects.like(self.user2, self.tweet1.pk)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_if_modified_since_alone_is_ignored(self):
+        url = reverse('apps.api:post_detail', kwargs={'pk': self.tweet1.pk})
+        response = self.client.get(url)
+        self.assertNotIn('Last-Modified', response)
+        Like.objects.like(self.user2, self.tweet1.pk)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['likes_count'], 2)
+
+    def test_timeline_invalid_cursor(self):
+        response = self.client.get(reverse('apps.api:timeline'), {'cursor': '!!'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_timeline_since(self):
+        url = reverse('apps.api:timeline_since')
+        since = json.loads(self.client.get(url).content)['since']
+        data = json.loads(self.client.get(url, {'since': since}).content)
+        self.assertEqual((data['posts'], data['since']), ([], since))
+        tweet3 = Post.objects.create(title='test3', content='content3', user=self.user2)
+        tweet4 = Post.objects.create(title='test4', content='content4', user=self.user2)
+        fan_out_post(tweet3)
+        fan_out_post(tweet4)
+        Like.objects.like(self.user1, tweet3.pk)
+        with self.assertNumQueries(5):
+            data = json.loads(self.client.get(url, {'since': since}).content)
+        self.assertEqual([post['post_pk'] for post in data['posts']], [tweet4.pk, tweet3.pk])
+        self.assertEqual([post['liked'] for post in data['posts']], [False, True])
+        data = json.loads(self.client.get(url, {'since': data['since']}).content)
+        self.assertEqual(data['posts'], [])
+
+    def test_timeline_since_long_poll_times_out(self):
+        url = reverse('apps.api:timeline_since')
+        since = json.loads(self.client.get(url).content)['since']
+        start = time.monotonic()
+        data = json.loads(self.client.get(url, {'since': since, 'wait': '0.1'}).content)
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+        self.assertEqual(data['posts'], [])
+
+    def test_timeline_since_invalid(self):
+        url = reverse('apps.api:timeline_since')
+        since = json.loads(self.client.get(url).content)['since']
+        self.assertEqual(self.client.get(url, {'since': '!!'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'since': since, 'wait': 'soon'}).status_code, 400)
+
+    def test_post_detail(self):
+        url = reverse('apps.api:post_detail', kwargs={'pk': self.tweet1.pk})
+        response = self.client.get(url)
+        self.assertEqual(json.loads(response.content)['likes_count'], 1)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.client.post(reverse('apps.api:post_like', kwargs={'pk': self.tweet1.pk}))
+        self.client.delete(reverse('apps.api:post_like', kwargs={'pk': self.tweet1.pk}))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(json.loads(response.content)['liked'])
+
+    def test_post_detail_missing(self):
+        response = self.client.get(reverse('apps.api:post_detail', kwargs={'pk': self.tweet2.pk + 1}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_like_and_unlike(self):
+        url = reverse('apps.api:post_like', kwargs={'pk': self.tweet2.pk})
+        data = json.loads(self.client.post(url).content)
+        self.assertEqual((data['likes_count'], data['liked']), (1, True))
+        data = json.loads(self.client.delete(url).content)
+        self.assertEqual((data['likes_count'], data['liked']), (0, False))
+
+    def test_profile(self):
+        response = self.client.get(reverse('apps.api:profile', kwargs={'username': 'foo2'}))
+        data = json.loads(response.content)
+        self.assertEqual(data['user']['username'], 'foo2')
+        self.assertEqual(data['user']['followers_count'], 1)
+        self.assertTrue(data['user']['is_following'])
+        self.assertEqual([post['post_pk'] for post in data['posts']], [self.tweet2.pk, self.tweet1.pk])
+
+    def test_follow_lists(self):
+        data = json.loads(self.client.get(reverse('apps.api:following', kwargs={'username': 'foo1'})).content)
+        self.assertEqual(data['count'], 1)
+        self.assertEqual([user['username'] for user in data['users']], ['foo2'])
+        data = json.loads(self.client.get(reverse('apps.api:followers', kwargs={'username': 'foo2'})).content)
+        self.assertEqual([user['username'] for user in data['users']], ['foo1'])
+        response = self.client.get(reverse('apps.api:followers', kwargs={'username': 'missing'}))
+        self.assertEqual(response.status_code, 404)
+
+
+class LongPollTests(TransactionTestCase):
+    """Posts are announced on commit of their fan-out, which TestCase never reaches."""
+
+    def setUp(self):
+        self.user1 = User.objects.create_user('foo1', 'foo1@example.com', 'testpassword')
+        self.user2 = User.objects.create_user('foo2', 'foo2@example.com', 'testpassword')
+        Follow.objects.follow(self.user1, self.user2)
+        self.url = reverse('apps.api:timeline_since')
+        self.client.login(username='foo1', password='testpassword')
+        self.since = json.loads(self.client.get(self.url).content)['since']
+
+    def create_post(self, title):
+        self.client.login(username='foo2', password='testpassword')
+        self.client.post(reverse('apps.users:tweet_create'), {'title': title, 'content': 'test'})
+        self.client.login(username='foo1', password='testpassword')
+        return Post.objects.get(title=title)
+
+    def test_post_wakes_poll_after_fan_out(self):
+        version = new_posts.version
+        post = self.create_post('inline')
+        self.assertEqual(new_posts.wait(version, 0), version + 1)
+        data = json.loads(self.client.get(self.url, {'since': self.since, 'wait': '5'}).content)
+        self.assertEqual([row['post_pk'] for row in data['posts']], [post.pk])
+
+    @override_settings(JOB_QUEUE_ENABLED=True)
+    def test_queued_post_is_announced_by_the_job(self):
+        version = new_posts.version
+        post = self.create_post('queued')
+        self.assertEqual(new_posts.version, version)
+        self.assertEqual(run_pending(), 2)
+        self.assertEqual(new_posts.wait(version, 0), version + 1)
+        data = json.loads(self.client.get(self.url, {'since': self.since}).content)
+        self.assertEqual([row['post_pk'] for row in data['posts']], [post.pk])
+
+    @override_settings(LONG_POLL_INTERVAL=0.05)
+    def test_poll_sees_post_fanned_out_elsewhere(self):
+        # Another process: the post is fanned out without waking this one.
+        post = Post.objects.create(title='elsewhere', content='test', user=self.user2)
+
+        def fan_out_later():
+            time.sleep(0.2)
+            fan_out_post(post)
+            connection.close()
+
+        thread = threading.Thread(target=fan_out_later)
+        thread.start()
+        start = time.monotonic()
+        data = json.loads(self.client.get(self.url, {'since': self.since, 'wait': '5'}).content)
+        thread.join()
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual([row['post_pk'] for row in data['posts']], [post.pk])
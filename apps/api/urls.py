@@ -0,0 +1,16 @@
+from django.urls import path
+
+from . import views
+
+
+app_name = 'apps.api'
+
+urlpatterns = [
+    path('timeline/', views.TimelineView.as_view(), name='timeline'),
+    path('timeline/since/', views.TimelineSinceView.as_view(), name='timeline_since'),
+    path('posts/<int:pk>/', views.PostDetailView.as_view(), name='post_detail'),
+    path('posts/<int:pk>/like/', views.PostLikeView.as_view(), name='post_like'),
+    path('users/<str:username>/', views.ProfileView.as_view(), name='profile'),
+    path('users/<str:username>/following/', views.FollowingView.as_view(), name='following'),
+    path('users/<str:username>/followers/', views.FollowersView.as_view(), name='followers'),
+]
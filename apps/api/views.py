@@ -0,0 +1,226 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from django.http import Http404, HttpResponseBadRequest, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils import timezone
+from django.utils.http import quote_etag
+from django.views.generic import View
+
+from apps.tweet.models import Like, Post
+from apps.tweet.notify import new_posts
+from apps.tweet.pagination import InvalidCursor, encode_cursor, paginate_keyset
+from apps.tweet.timeline import home_timeline_keys, home_timeline_since
+from apps.tweet.views import LikeBase
+from apps.users.models import Follow, User
+
+
+def post_rows(post_pks, liked):
+    """Serialize posts straight from ``values()`` rows, in ``post_pks`` order."""
+    rows = {
+        row['post_pk']: row
+        for row in Post.objects.filter(pk__in=post_pks).values(
+            'title', 'content', 'created_at',
+            post_pk=F('id'), username=F('user__username'), likes_count=F('like_count'),
+        )
+    }
+    posts = []
+    for pk in post_pks:
+        if pk in rows:
+            rows[pk]['liked'] = pk in liked
+            posts.append(rows[pk])
+    return posts
+
+
+class ConditionalJsonView(LoginRequiredMixin, View):
+    """
+    A JSON GET endpoint with conditional responses.
+
+    ``get_version`` runs the cheap queries whose results change whenever
+    the payload would: page keys, counters, the viewer's like state. Its
+    hash is a strong ETag, so a client sending a matching
+    ``If-None-Match`` gets a bodiless 304 before ``get_data`` loads the
+    payload. There is no ``Last-Modified``: no timestamp moves when a
+    counter or like state does.
+    """
+    raise_exception = True
+    replica_reads = True
+
+    def get(self, request, *args, **kwargs):
+        try:
+            version = self.get_version()
+        except InvalidCursor:
+            return HttpResponseBadRequest()
+        digest = hashlib.sha1(json.dumps([request.user.pk, version], cls=DjangoJSONEncoder).encode())
+        etag = quote_etag(digest.hexdigest())
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = JsonResponse(self.get_data(version))
+        response['ETag'] = etag
+        patch_vary_headers(response, ['Cookie'])
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def get_version(self):
+        raise NotImplementedError
+
+    def get_data(self, version):
+        raise NotImplementedError
+
+
+class TimelineView(ConditionalJsonView):
+
+    def get_version(self):
+        keys, next_cursor = home_timeline_keys(self.request.user, self.request.GET.get('cursor'))
+        posts = Post.objects.filter(pk__in=[pk for _, pk in keys]).with_liked(self.request.user)
+        return {
+            'keys': keys,
+            'next_cursor': next_cursor,
+            'counts': list(posts.order_by('pk').values_list('pk', 'like_count', 'liked')),
+        }
+
+    def get_data(self, version):
+        return {
+            'posts': post_rows(
+                [pk for _, pk in version['keys']], {pk for pk, _, liked in version['counts'] if liked}
+            ),
+            'next_cursor': version['next_cursor'],
+        }
+
+
+class TimelineSinceView(LoginRequiredMixin, View):
+    """
+    Up to a page of timeline posts newer than the ``since`` cursor, newest
+    first, with the cursor to poll from next. Without ``since`` it only returns a cursor
+    for the newest post. With ``wait=<seconds>`` an empty answer is held
+    back until a new post is announced or the wait, capped at
+    ``LONG_POLL_TIMEOUT``, runs out. The timeline is also checked every
+    ``LONG_POLL_INTERVAL`` seconds, for posts fanned out by another process.
+    """
+    raise_exception = True
+
+    def get(self, request, *args, **kwargs):
+        since = request.GET.get('since')
+        if not since:
+            keys, _ = home_timeline_keys(request.user, page_size=1)
+            newest = keys[0] if keys else (timezone.now(), 0)
+            return JsonResponse({'posts': [], 'since': encode_cursor(*newest)})
+        try:
+            wait = min(max(float(request.GET.get('wait', 0)), 0), settings.LONG_POLL_TIMEOUT)
+            deadline = time.monotonic() + wait
+            version = new_posts.version
+            keys = home_timeline_since(request.user, since)
+            while not keys and time.monotonic() < deadline:
+                version = new_posts.wait(version, min(deadline - time.monotonic(), settings.LONG_POLL_INTERVAL))
+                keys = home_timeline_since(request.user, since)
+        except (InvalidCursor, ValueError):
+            return HttpResponseBadRequest()
+        post_pks = [pk for _, pk in reversed(keys)]
+        liked = Like.objects.liked_post_pks(request.user, post_pks)
+        return JsonResponse({
+            'posts': post_rows(post_pks, liked),
+            'since': encode_cursor(*keys[-1]) if keys else since,
+        })
+
+
+class PostDetailView(ConditionalJsonView):
+
+    def get_version(self):
+        row = Post.objects.filter(pk=self.kwargs['pk']).with_liked(self.request.user).values(
+            'created_at', 'like_count', 'liked',
+        ).first()
+        if row is None:
+            raise Http404
+        return row
+
+    def get_data(self, version):
+        liked = {self.kwargs['pk']} if version['liked'] else set()
+        return post_rows([self.kwargs['pk']], liked)[0]
+
+
+class ProfileView(ConditionalJsonView):
+
+    def get_version(self):
+        user = User.objects.filter(username=self.kwargs['username']).values(
+            'id', 'username', 'date_joined', 'followers_count', 'following_count',
+        ).first()
+        if user is None:
+            raise Http404
+        posts, next_cursor = paginate_keyset(
+            Post.objects.filter(user=user['id']).with_liked(self.request.user).values(
+                'id', 'created_at', 'like_count', 'liked',
+            ),
+            self.request.GET.get('cursor'),
+        )
+        return {
+            'user': user,
+            'is_following': bool(Follow.objects.is_following(self.request.user, [user['id']])),
+            'posts': [[post['id'], post['like_count'], post['liked']] for post in posts],
+            'next_cursor': next_cursor,
+        }
+
+    def get_data(self, version):
+        user = dict(version['user'], is_following=version['is_following'])
+        del user['id']
+        return {
+            'user': user,
+            'posts': post_rows(
+                [pk for pk, _, _ in version['posts']], {pk for pk, _, liked in version['posts'] if liked}
+            ),
+            'next_cursor': version['next_cursor'],
+        }
+
+
+class FollowListView(ConditionalJsonView):
+    user_field = None
+    other_field = None
+    count_field = None
+
+    def get_version(self):
+        user = User.objects.filter(username=self.kwargs['username']).values('id', self.count_field).first()
+        if user is None:
+            raise Http404
+        edges, next_cursor = paginate_keyset(
+            Follow.objects.filter(**{self.user_field: user['id']}).values(
+                'id', 'created_at', username=F(self.other_field + '__username'),
+            ),
+            self.request.GET.get('cursor'),
+        )
+        return {
+            'count': user[self.count_field],
+            'users': [{'username': edge['username'], 'followed_at': edge['created_at']} for edge in edges],
+            'next_cursor': next_cursor,
+        }
+
+    def get_data(self, version):
+        return version
+
+
+class FollowingView(FollowListView):
+    user_field = 'follower'
+    other_field = 'followee'
+    count_field = 'following_count'
+
+
+class FollowersView(FollowListView):
+    user_field = 'followee'
+    other_field = 'follower'
+    count_field = 'followers_count'
+
+
+class PostLikeView(LikeBase):
+    """``POST`` likes the post and ``DELETE`` unlikes it."""
+    raise_exception = True
+
+    def delete(self, request, *args, **kwargs):
+        self.liked = False
+        return super().post(request, *args, **kwargs)
+
+    def post(self, request, *args, **kwargs):
+        self.liked = True
+        return super().post(request, *args, **kwargs)
@@ -0,0 +1,55 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.jobs.queue import claim, run_job
+
+
+def run_in_pool(job):
+    try:
+        return run_job(job)
+    finally:
+        # Pool threads outlive jobs; treat each job like a request.
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = (
+        'Claim due jobs in batches and run them on a thread pool, or in this thread '
+        'with --threads 0. With --once, exit when no job is due instead of polling.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--poll-interval', type=float, default=None, help='Seconds to sleep while the queue is empty.')
+        parser.add_argument('--once', action='store_true')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size'] or settings.JOB_BATCH_SIZE
+        poll_interval = options['poll_interval'] or settings.JOB_POLL_INTERVAL
+        pool = ThreadPoolExecutor(max_workers=options['threads']) if options['threads'] else None
+        succeeded = failed = 0
+        try:
+            while True:
+                jobs = claim(batch_size)
+                if not jobs:
+                    if options['once']:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+                results = pool.map(run_in_pool, jobs) if pool else map(run_job, jobs)
+                for ok in results:
+                    if ok:
+                        succeeded += 1
+                    else:
+                        failed += 1
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if pool:
+                pool.shutdown()
+        self.stdout.write('Ran {} jobs; {} failed.'.format(succeeded + failed, failed))
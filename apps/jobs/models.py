@@ -0,0 +1,33 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    A queued call of an ``apps.jobs.queue.task`` function. ``run_at`` is
+    when the job is next due; claiming a job moves it forward by the lease,
+    so a job whose worker died becomes due again. Jobs that succeed are
+    deleted; jobs that run out of attempts stay behind as dead letters.
+    """
+    QUEUED = 'queued'
+    DEAD = 'dead'
+    STATUS_CHOICES = [
+        (QUEUED, 'queued'),
+        (DEAD, 'dead'),
+    ]
+
+    name = models.CharField(max_length=200, help_text='Dotted path of the task function.')
+    payload = models.TextField(help_text='JSON object of keyword arguments.')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    run_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='jobs_job_status_run_idx'),
+        ]
+
+    def __str__(self):
+        return '{} #{}'.format(self.name, self.pk)
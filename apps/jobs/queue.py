@@ -0,0 +1,98 @@
+import json
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+
+def task(func):
+    """Mark ``func`` as runnable from the queue; it must take JSON-serializable keyword arguments."""
+    func.is_task = True
+    return func
+
+
+def enqueue(func, **kwargs):
+    """
+    Queue ``func(**kwargs)`` for ``run_worker``. The job row is written in
+    the caller's transaction, so it is dropped if that rolls back. With
+    ``JOB_QUEUE_ENABLED`` off the call runs inline instead.
+    """
+    if not getattr(func, 'is_task', False):
+        raise ValueError('{!r} is not a task.'.format(func))
+    if not settings.JOB_QUEUE_ENABLED:
+        func(**kwargs)
+        return None
+    return Job.objects.create(
+        name='{}.{}'.format(func.__module__, func.__name__),
+        payload=json.dumps(kwargs),
+    )
+
+
+def claim(limit):
+    """
+    Take up to ``limit`` due jobs for this worker and return them. Each
+    job is claimed with an update conditional on the ``run_at`` just read,
+    so when two workers read the same row only one of them gets it.
+    """
+    now = timezone.now()
+    lease_end = now + timedelta(seconds=settings.JOB_LEASE)
+    due = list(
+        Job.objects.filter(status=Job.QUEUED, run_at__lte=now)
+        .order_by('run_at', 'pk').values_list('pk', 'run_at')[:limit]
+    )
+    claimed = [
+        pk for pk, run_at in due
+        if Job.objects.filter(pk=pk, status=Job.QUEUED, run_at=run_at).update(
+            run_at=lease_end, attempts=F('attempts') + 1,
+        )
+    ]
+    return list(Job.objects.filter(pk__in=claimed).order_by('pk')) if claimed else []
+
+
+def run_job(job):
+    """
+    Run one claimed job in a transaction. On success the job is deleted.
+    On failure it is retried after ``JOB_RETRY_BACKOFF`` seconds, doubled
+    for every earlier attempt, or marked dead after ``JOB_MAX_ATTEMPTS``.
+    Returns whether the job succeeded.
+    """
+    try:
+        func = import_string(job.name)
+        if not getattr(func, 'is_task', False):
+            raise ValueError('{} is not a task.'.format(job.name))
+        with transaction.atomic():
+            func(**json.loads(job.payload))
+    except Exception:
+        logger.exception('Job %s (%s) failed on attempt %s', job.pk, job.name, job.attempts)
+        error = traceback.format_exc()
+        if job.attempts >= settings.JOB_MAX_ATTEMPTS:
+            Job.objects.filter(pk=job.pk).update(status=Job.DEAD, last_error=error)
+        else:
+            backoff = settings.JOB_RETRY_BACKOFF * 2 ** (job.attempts - 1)
+            Job.objects.filter(pk=job.pk).update(
+                run_at=timezone.now() + timedelta(seconds=backoff), last_error=error,
+            )
+        return False
+    Job.objects.filter(pk=job.pk).delete()
+    return True
+
+
+def run_pending(batch_size=None):
+    """Run due jobs in this thread until none are left; return how many ran."""
+    ran = 0
+    while True:
+        jobs = claim(batch_size or settings.JOB_BATCH_SIZE)
+        if not jobs:
+            return ran
+        for job in jobs:
+            run_job(job)
+        ran += len(jobs)
@@ -0,0 +1,135 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from apps.jobs.models import Job
+from apps.jobs.queue import claim, enqueue, run_job, run_pending, task
+
+calls = []
+
+
+@task
+def record(value):
+    calls.append(value)
+
+
+@task
+def fail(value):
+    raise RuntimeError(value)
+
+
+@task
+def write_then_fail():
+    Job.objects.create(name='apps.jobs.tests.record', payload='{"value": 0}')
+    raise RuntimeError('after write')
+
+
+def not_a_task():
+    pass
+
+
+@override_settings(JOB_QUEUE_ENABLED=True, JOB_MAX_ATTEMPTS=3, JOB_RETRY_BACKOFF=10)
+class JobQueueTests(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    @override_settings(JOB_QUEUE_ENABLED=False)
+    def test_runs_inline_when_disabled(self):
+        self.assertIsNone(enqueue(record, value=1))
+        self.assertEqual(calls, [1])
+        self.assertFalse(Job.objects.exists())
+
+    def test_enqueue_rejects_plain_functions(self):
+        with self.assertRaises(ValueError):
+            enqueue(not_a_task)
+
+    def test_run_pending(self):
+        enqueue(record, value=1)
+        enqueue(record, value=2)
+        self.assertEqual(calls, [])
+        self.assertEqual(run_pending(), 2)
+        self.assertEqual(calls, [1, 2])
+        self.assertFalse(Job.objects.exists())
+
+    def test_claimed_job_is_leased(self):
+        job = enqueue(record, value=1)
+        self.assertEqual(claim(10), [job])
+        self.assertEqual(claim(10), [])
+        # The worker died; once the lease runs out the job is due again.
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now() - timedelta(seconds=1))
+        [job] = claim(10)
+        self.assertEqual(job.attempts, 2)
+
+    def test_claim_skips_future_and_dead_jobs(self):
+        enqueue(record, value=1)
+        Job.objects.update(run_at=timezone.now() + timedelta(minutes=1))
+        enqueue(record, value=2)
+        Job.objects.filter(payload='{"value": 2}').update(status=Job.DEAD)
+        self.assertEqual(claim(10), [])
+
+    def test_failure_backs_off_then_dies(self):
+        job = enqueue(fail, value='boom')
+        for attempt, backoff in ((1, 10), (2, 20)):
+            [job] = claim(10)
+            self.assertEqual(job.attempts, attempt)
+            before = timezone.now()
+            with self.assertLogs('apps.jobs.queue', 'ERROR'):
+                self.assertFalse(run_job(job))
+            job.refresh_from_db()
+            self.assertEqual(job.status, Job.QUEUED)
+            self.assertIn('RuntimeError: boom', job.last_error)
+            self.assertGreaterEqual(job.run_at, before + timedelta(seconds=backoff))
+            Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        [job] = claim(10)
+        with self.assertLogs('apps.jobs.queue', 'ERROR'):
+            self.assertFalse(run_job(job))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.DEAD, 3))
+        self.assertEqual(run_pending(), 0)
+
+    def test_unknown_task_fails(self):
+        Job.objects.create(name='apps.jobs.tests.not_a_task', payload='{}')
+        [job] = claim(10)
+        with self.assertLogs('apps.jobs.queue', 'ERROR'):
+            self.assertFalse(run_job(job))
+        job.refresh_from_db()
+        self.assertIn('is not a task', job.last_error)
+
+    def test_failed_job_rolls_back(self):
+        enqueue(write_then_fail)
+        with self.assertLogs('apps.jobs.queue', 'ERROR'):
+            run_pending()
+        self.assertEqual(list(Job.objects.values_list('name', 'attempts')), [('apps.jobs.tests.write_then_fail', 1)])
+
+    def test_run_worker_once(self):
+        enqueue(record, value=1)
+        enqueue(fail, value='boom')
+        out = StringIO()
+        with self.assertLogs('apps.jobs.queue', 'ERROR'):
+            call_command('run_worker', threads=0, once=True, stdout=out)
+        self.assertEqual(calls, [1])
+        self.assertIn('Ran 2 jobs; 1 failed.', out.getvalue())
+        self.assertEqual(list(Job.objects.values_list('name', flat=True)), ['apps.jobs.tests.fail'])
+
+
+@override_settings(JOB_QUEUE_ENABLED=True)
+class RunWorkerThreadsTests(TransactionTestCase):
+    """Pool threads get their own connections, so this needs committed data."""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_run_worker_pool(self):
+        for value in range(5):
+            enqueue(record, value=value)
+        enqueue(fail, value='boom')
+        out = StringIO()
+        with self.assertLogs('apps.jobs.queue', 'ERROR'):
+            call_command('run_worker', threads=2, batch_size=2, once=True, stdout=out)
+        self.assertEqual(sorted(calls), [0, 1, 2, 3, 4])
+        self.assertIn('Ran 6 jobs; 1 failed.', out.getvalue())
+        self.assertEqual(list(Job.objects.values_list('name', flat=True)), ['apps.jobs.tests.fail'])
@@ -0,0 +1,6 @@
+from django.contrib import admin
+
+from .models import RequestProfile
+
+
+admin.site.register(RequestProfile)
@@ -0,0 +1,5 @@
+from django.apps import AppConfig
+
+
+class PerfConfig(AppConfig):
+    name = 'apps.perf'
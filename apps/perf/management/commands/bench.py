@@ -0,0 +1,106 @@
+import json
+import statistics
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.perf.stats import percentile
+from apps.tweet.models import Post
+from apps.users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Drive the main views through the test client and report latency, query counts and peak memory.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--username', help='Viewer to benchmark as. Defaults to the user following the most accounts.')
+        parser.add_argument('--json', action='store_true', help='Emit one JSON object per endpoint.')
+
+    def handle(self, *args, **options):
+        viewer = self.get_viewer(options['username'])
+        target = User.objects.filter(follower_edges__follower=viewer).order_by('-followers_count').first()
+        post = Post.objects.filter(user=target).first() if target else None
+        if target is None or post is None:
+            raise CommandError('The viewer must follow someone with posts; run seed_benchmark first.')
+
+        client = Client(HTTP_HOST='127.0.0.1')
+        client.force_login(viewer)
+        like_url = reverse('apps.users:like', kwargs={'pk': post.pk})
+        unlike_url = reverse('apps.users:unlike', kwargs={'pk': post.pk})
+        follow_url = reverse('apps.users:follow_in_profile', kwargs={'pk': target.pk})
+        # Toggles are benchmarked as cycles so every iteration changes state,
+        # but each request in a cycle is timed and reported on its own.
+        profile_url = reverse('apps.users:profile', kwargs={'username': target.username})
+        cycles = [
+            [('HomeView', lambda: client.get(reverse('apps.users:home')))],
+            [('UserProfileView', lambda: client.get(profile_url))],
+            [('LikeTweet', lambda: client.post(like_url)), ('UnlikeTweet', lambda: client.post(unlike_url))],
+            [
+                ('FollowInUserProfile:follow', lambda: client.get(follow_url)),
+                ('FollowInUserProfile:unfollow', lambda: client.get(follow_url)),
+            ],
+        ]
+        for cycle in cycles:
+            for result in self.measure(cycle, options['iterations'], options['warmup']):
+                if options['json']:
+                    self.stdout.write(json.dumps(result))
+                else:
+                    self.stdout.write(
+                        '{endpoint:<28} p50={p50_ms:>8.2f}ms p95={p95_ms:>8.2f}ms '
+                        'queries={queries:>4} peak_memory={peak_kib:>8.1f}KiB'.format(**result)
+                    )
+
+    def get_viewer(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError("User '{}' does not exist.".format(username))
+        viewer = User.objects.order_by('-following_count').first()
+        if viewer is None:
+            raise CommandError('No users found; run seed_benchmark first.')
+        return viewer
+
+    def measure(self, cycle, iterations, warmup):
+        for _ in range(warmup):
+            for name, request in cycle:
+                self.check_response(name, request())
+        timings = {name: [] for name, _ in cycle}
+        queries = {name: [] for name, _ in cycle}
+        for _ in range(iterations):
+            for name, request in cycle:
+                with CaptureQueriesContext(connection) as context:
+                    start = time.perf_counter()
+                    self.check_response(name, request())
+                    timings[name].append((time.perf_counter() - start) * 1000)
+                queries[name].append(len(context))
+        # Allocation tracing slows requests down, so memory gets its own pass.
+        peaks = {}
+        for name, request in cycle:
+            tracemalloc.start()
+            try:
+                request()
+                _, peaks[name] = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+        return [
+            {
+                'endpoint': name,
+                'p50_ms': statistics.median(timings[name]),
+                'p95_ms': percentile(timings[name], 0.95),
+                'queries': int(statistics.median(queries[name])),
+                'peak_kib': peaks[name] / 1024,
+            }
+            for name, _ in cycle
+        ]
+
+    def check_response(self, name, response):
+        if response.status_code >= 400:
+            raise CommandError('{} returned HTTP {}.'.format(name, response.status_code))
@@ -0,0 +1,125 @@
+import json
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+
+from apps.tweet.models import Like, Post
+from apps.users.models import Follow, User
+
+# Each backend runs on its own copy of the database; the stock one reverts
+# the copy to rollback journaling and drops its connection after every
+# operation, as CONN_MAX_AGE = 0 does after every request.
+BACKENDS = [
+    ('stock', {'ENGINE': 'django.db.backends.sqlite3', 'CONN_MAX_AGE': 0}),
+    ('tuned', {'ENGINE': 'twitter_clone.sqlite_backend', 'CONN_MAX_AGE': 60}),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Run concurrent like/unlike and follow/unfollow writes against copies of the '
+        'database with the stock and tuned SQLite backends; report throughput and lock errors.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--operations', type=int, default=50, help='Write operations per thread.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', action='store_true', help='Emit one JSON object per backend.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('bench_concurrency compares SQLite backends only.')
+        users = list(User.objects.order_by('pk').only('pk')[:100])
+        post_pks = list(Post.objects.order_by('-pk').values_list('pk', flat=True)[:100])
+        if len(users) < 2 or not post_pks:
+            raise CommandError('Not enough users or posts; run seed_benchmark first.')
+
+        workdir = tempfile.mkdtemp()
+        try:
+            for name, engine in BACKENDS:
+                path = os.path.join(workdir, '{}.sqlite3'.format(name))
+                self.copy_database(path)
+                alias = 'bench_{}'.format(name)
+                connections.databases[alias] = dict(engine, NAME=path)
+                try:
+                    result = self.run(name, alias, users, post_pks, options)
+                finally:
+                    del connections.databases[alias]
+                if options['json']:
+                    self.stdout.write(json.dumps(result))
+                else:
+                    self.stdout.write(
+                        '{backend:<6} operations={operations:>6} seconds={seconds:>7.2f} '
+                        'ops_per_sec={ops_per_sec:>8.1f} lock_errors={lock_errors:>5} '
+                        'lock_error_rate={lock_error_rate:.2%}'.format(**result)
+                    )
+        finally:
+            shutil.rmtree(workdir)
+
+    def copy_database(self, path):
+        connection.ensure_connection()
+        target = sqlite3.connect(path)
+        try:
+            connection.connection.backup(target)
+            target.execute('PRAGMA journal_mode = DELETE')
+        finally:
+            target.close()
+
+    def run(self, name, alias, users, post_pks, options):
+        lock_errors = []
+
+        def worker(seed):
+            rng = random.Random(seed)
+            db = connections[alias]
+            try:
+                for _ in range(options['operations'] // 2):
+                    user, other = rng.sample(users, 2)
+                    post_pk = rng.choice(post_pks)
+                    if rng.random() < 0.5:
+                        pair = [
+                            lambda: Like.objects.db_manager(alias).like(user, post_pk),
+                            lambda: Like.objects.db_manager(alias).unlike(user, post_pk),
+                        ]
+                    else:
+                        pair = [
+                            lambda: Follow.objects.db_manager(alias).follow(user, other),
+                            lambda: Follow.objects.db_manager(alias).unfollow(user, other),
+                        ]
+                    for operation in pair:
+                        try:
+                            operation()
+                        except OperationalError as e:
+                            if 'locked' not in str(e):
+                                raise
+                            lock_errors.append(name)
+                        # What the request_finished signal does between requests.
+                        db.close_if_unusable_or_obsolete()
+            finally:
+                db.close()
+
+        threads = [
+            threading.Thread(target=worker, args=(options['seed'] + i,)) for i in range(options['threads'])
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = time.perf_counter() - start
+        operations = options['operations'] // 2 * 2 * options['threads']
+        return {
+            'backend': name,
+            'operations': operations,
+            'seconds': seconds,
+            'ops_per_sec': operations / seconds if seconds else 0.0,
+            'lock_errors': len(lock_errors),
+            'lock_error_rate': len(lock_errors) / operations if operations else 0.0,
+        }
@@ -0,0 +1,82 @@
+import json
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from apps.tweet.counters import reconcile_like_counts
+from apps.tweet.likebuffer import like_buffer
+from apps.tweet.models import Post
+from apps.users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Hammer one post with like/unlike toggles from several threads, once through '
+        'the per-click views and once through the coalescing like buffer.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--toggles', type=int, default=200, help='Toggles per thread.')
+        parser.add_argument('--mode', choices=['sync', 'buffered', 'both'], default='both')
+        parser.add_argument('--json', action='store_true', help='Emit one JSON object per mode.')
+
+    def handle(self, *args, **options):
+        users = list(User.objects.order_by('pk')[:options['threads']])
+        post = Post.objects.order_by('-like_count', '-pk').first()
+        if len(users) < options['threads'] or post is None:
+            raise CommandError('Not enough users or posts; run seed_benchmark first.')
+
+        modes = ['sync', 'buffered'] if options['mode'] == 'both' else [options['mode']]
+        for mode in modes:
+            with override_settings(LIKE_BUFFER_ENABLED=mode == 'buffered'):
+                result = self.run(mode, users, post, options['toggles'])
+            if options['json']:
+                self.stdout.write(json.dumps(result))
+            else:
+                self.stdout.write(
+                    '{mode:<9} toggles={toggles:>6} seconds={seconds:>8.2f} '
+                    'toggles_per_sec={toggles_per_sec:>9.1f} errors={errors:>4} drift={drift}'.format(**result)
+                )
+
+    def run(self, mode, users, post, toggles):
+        errors = []
+        urls = [reverse('apps.users:like', kwargs={'pk': post.pk}), reverse('apps.users:unlike', kwargs={'pk': post.pk})]
+
+        def worker(user):
+            client = Client(HTTP_HOST='127.0.0.1')
+            client.force_login(user)
+            try:
+                for i in range(toggles):
+                    try:
+                        response = client.post(urls[i % 2])
+                    except DatabaseError:
+                        errors.append(mode)
+                        continue
+                    if response.status_code >= 400:
+                        errors.append(mode)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(user,)) for user in users]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        like_buffer.flush()
+        seconds = time.perf_counter() - start
+        total = toggles * len(users)
+        return {
+            'mode': mode,
+            'toggles': total,
+            'seconds': seconds,
+            'toggles_per_sec': total / seconds if seconds else 0.0,
+            'errors': len(errors),
+            # Posts whose like_count disagreed with the Like table afterwards.
+            'drift': reconcile_like_counts(),
+        }
@@ -0,0 +1,83 @@
+import json
+import statistics
+import time
+
+from django.core.cache import cache, caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.perf.stats import percentile
+from apps.users.models import User
+
+MODES = [
+    ('uncached', {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'AUTHENTICATION_BACKENDS': ['django.contrib.auth.backends.ModelBackend'],
+    }),
+    ('cached', {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+        'AUTHENTICATION_BACKENDS': ['apps.users.backends.CachedModelBackend'],
+    }),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure HomeView with database sessions and uncached user lookups, then with '
+        'cached_db sessions and the cached auth backend.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--json', action='store_true', help='Emit one JSON object per mode.')
+
+    def handle(self, *args, **options):
+        viewer = User.objects.order_by('-following_count').first()
+        if viewer is None:
+            raise CommandError('No users found; run seed_benchmark first.')
+
+        for name, overrides in MODES:
+            cache.clear()
+            caches['sessions'].clear()
+            with override_settings(**overrides):
+                result = self.measure(name, viewer, options['iterations'], options['warmup'])
+            if options['json']:
+                self.stdout.write(json.dumps(result))
+            else:
+                self.stdout.write(
+                    '{mode:<9} p50={p50_ms:>8.2f}ms p95={p95_ms:>8.2f}ms '
+                    'queries={queries:>3} session_and_user_queries={overhead_queries:>3}'.format(**result)
+                )
+
+    def measure(self, name, viewer, iterations, warmup):
+        # A new client per mode, so the session middleware picks up the engine.
+        client = Client(HTTP_HOST='127.0.0.1')
+        client.force_login(viewer)
+        url = reverse('apps.users:home')
+        for _ in range(warmup):
+            client.get(url)
+        timings = []
+        queries = []
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                raise CommandError('HomeView returned HTTP {}.'.format(response.status_code))
+            queries.append(context.captured_queries)
+        last = queries[-1]
+        return {
+            'mode': name,
+            'p50_ms': statistics.median(timings),
+            'p95_ms': percentile(timings, 0.95),
+            'queries': int(statistics.median(len(captured) for captured in queries)),
+            'overhead_queries': sum(
+                'FROM "django_session"' in query['sql'] or 'FROM "users_user" WHERE' in query['sql']
+                for query in last
+            ),
+        }
@@ -0,0 +1,55 @@
+import json
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.perf.models import RequestProfile
+from apps.perf.stats import percentile
+
+
+class Command(BaseCommand):
+    help = 'Aggregate sampled request profiles per view over a rolling window.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minutes', type=int, default=60, help='Size of the rolling window.')
+        parser.add_argument('--top', type=int, default=3, help='Repeated SQL fingerprints to show per view.')
+        parser.add_argument('--prune', action='store_true', help='Delete profiles older than the window.')
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(minutes=options['minutes'])
+        if options['prune']:
+            RequestProfile.objects.filter(created_at__lt=since).delete()
+
+        views = defaultdict(lambda: {'total': [], 'sql_count': [], 'sql_ms': [], 'render_ms': [], 'dupes': Counter()})
+        profiles = RequestProfile.objects.filter(created_at__gte=since).values_list(
+            'view_name', 'total_ms', 'sql_count', 'sql_ms', 'render_ms', 'duplicate_queries'
+        )
+        for view_name, total_ms, sql_count, sql_ms, render_ms, duplicates in profiles.iterator():
+            stats = views[view_name]
+            stats['total'].append(total_ms)
+            stats['sql_count'].append(sql_count)
+            stats['sql_ms'].append(sql_ms)
+            stats['render_ms'].append(render_ms)
+            stats['dupes'].update(json.loads(duplicates or '{}'))
+
+        if not views:
+            self.stdout.write('No request profiles in the last {} minutes.'.format(options['minutes']))
+            return
+        # Slowest views first.
+        for view_name, stats in sorted(views.items(), key=lambda item: -percentile(item[1]['total'], 0.95)):
+            requests = len(stats['total'])
+            self.stdout.write(
+                '{} requests={} p50={:.1f}ms p95={:.1f}ms sql={:.1f} queries/{:.1f}ms render={:.1f}ms'.format(
+                    view_name,
+                    requests,
+                    percentile(stats['total'], 0.5),
+                    percentile(stats['total'], 0.95),
+                    sum(stats['sql_count']) / requests,
+                    sum(stats['sql_ms']) / requests,
+                    sum(stats['render_ms']) / requests,
+                )
+            )
+            for sql, count in stats['dupes'].most_common(options['top']):
+                self.stdout.write('    repeated x{}: {}'.format(count, sql))
@@ -0,0 +1,134 @@
+import bisect
+import itertools
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.tweet.bulk import explicit_timestamps
+from apps.tweet.counters import reconcile_like_counts
+from apps.tweet.models import Like, Post, TimelineEntry
+from apps.users.counters import reconcile_follow_counts
+from apps.users.models import Follow, User
+
+
+class ZipfSampler:
+    """Draw indexes in ``range(n)`` with probability proportional to 1 / (rank ** exponent)."""
+
+    def __init__(self, n, exponent, rng):
+        self.rng = rng
+        self.cum_weights = list(itertools.accumulate(1 / (rank ** exponent) for rank in range(1, n + 1)))
+
+    def sample(self):
+        return bisect.bisect(self.cum_weights, self.rng.random() * self.cum_weights[-1])
+
+
+class Command(BaseCommand):
+    help = 'Bulk-generate a synthetic social graph (users, follows, posts, likes) for benchmarking.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--likes', type=int, default=50000)
+        parser.add_argument('--follows-per-user', type=int, default=20)
+        parser.add_argument('--exponent', type=float, default=1.1, help='Zipf exponent for popularity skew.')
+        parser.add_argument('--days', type=int, default=30, help='Spread posts over this many past days.')
+        parser.add_argument('--prefix', default='bench')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=prefix + '_').exists():
+            raise CommandError("Users prefixed '{}_' already exist; pick another --prefix.".format(prefix))
+
+        user_ids = self.create_users(prefix, options['users'])
+        popularity = ZipfSampler(len(user_ids), options['exponent'], self.rng)
+        followers = self.create_follows(user_ids, popularity, options['follows_per_user'])
+        posts = self.create_posts(user_ids, popularity, options['posts'], options['days'])
+        self.create_likes(user_ids, posts, options['likes'], options['exponent'])
+        self.create_timelines(posts, followers)
+        reconcile_follow_counts(self.batch_size)
+        reconcile_like_counts(self.batch_size)
+        self.stdout.write('Seeded {} users, {} posts.'.format(len(user_ids), len(posts)))
+
+    def bulk_create(self, model, objs):
+        batch = []
+        for obj in objs:
+            batch.append(obj)
+            if len(batch) == self.batch_size:
+                model.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        model.objects.bulk_create(batch, ignore_conflicts=True)
+
+    def create_users(self, prefix, count):
+        password = make_password('benchpassword')
+        self.bulk_create(User, (
+            User(username='{}_{}'.format(prefix, i), email='{}_{}@example.com'.format(prefix, i), password=password)
+            for i in range(count)
+        ))
+        return list(User.objects.filter(username__startswith=prefix + '_').order_by('pk').values_list('pk', flat=True))
+
+    def create_follows(self, user_ids, popularity, per_user):
+        followers = {user_id: [] for user_id in user_ids}
+        edges = []
+        for follower_id in user_ids:
+            followees = {user_ids[popularity.sample()] for _ in range(per_user)}
+            followees.discard(follower_id)
+            for followee_id in followees:
+                followers[followee_id].append(follower_id)
+                edges.append(Follow(follower_id=follower_id, followee_id=followee_id))
+        self.bulk_create(Follow, edges)
+        return followers
+
+    def create_posts(self, user_ids, popularity, count, days):
+        now = timezone.now()
+        span = timedelta(days=days).total_seconds()
+        offsets = sorted((self.rng.random() * span for _ in range(count)), reverse=True)
+        with explicit_timestamps(Post):
+            self.bulk_create(Post, (
+                Post(
+                    title='bench post {}'.format(i),
+                    content='synthetic benchmark content {}'.format(i),
+                    user_id=user_ids[popularity.sample()],
+                    created_at=now - timedelta(seconds=offset),
+                )
+                for i, offset in enumerate(offsets)
+            ))
+        return list(
+            Post.objects.filter(user__in=user_ids).order_by('pk').values_list('pk', 'user_id', 'created_at')
+        )
+
+    def create_likes(self, user_ids, posts, count, exponent):
+        if not posts:
+            return
+        # Newer posts attract more likes.
+        post_popularity = ZipfSampler(len(posts), exponent, self.rng)
+        now = timezone.now()
+        seen = set()
+        likes = []
+        for _ in range(count):
+            post_id, _, created_at = posts[len(posts) - 1 - post_popularity.sample()]
+            user_id = self.rng.choice(user_ids)
+            if (user_id, post_id) in seen:
+                continue
+            seen.add((user_id, post_id))
+            liked_at = created_at + (now - created_at) * self.rng.random()
+            likes.append(Like(user_id=user_id, post_id=post_id, created_at=liked_at))
+        with explicit_timestamps(Like):
+            self.bulk_create(Like, likes)
+
+    def create_timelines(self, posts, followers):
+        threshold = settings.TIMELINE_FANOUT_THRESHOLD
+        self.bulk_create(TimelineEntry, (
+            TimelineEntry(owner_id=owner_id, post_id=post_id, created_at=created_at)
+            for post_id, author_id, created_at in posts
+            for owner_id in itertools.chain(
+                [author_id], followers[author_id] if len(followers[author_id]) <= threshold else []
+            )
+        ))
@@ -0,0 +1,145 @@
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.template.backends.django import Template
+
+from .models import RequestProfile
+
+logger = logging.getLogger(__name__)
+_local = threading.local()
+_buffer = []
+_buffer_lock = threading.Lock()
+
+
+class Profile:
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.render_seconds = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_seconds += time.perf_counter() - start
+            self.sql_count += 1
+            # Parameters are passed separately, so the SQL text is already a fingerprint.
+            self.fingerprints[sql] += 1
+
+    def duplicates(self):
+        return {sql: count for sql, count in self.fingerprints.items() if count > 1}
+
+
+def _timed_render(render):
+    def wrapper(self, context=None, request=None):
+        profile = getattr(_local, 'profile', None)
+        if profile is None:
+            return render(self, context, request)
+        start = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            profile.render_seconds += time.perf_counter() - start
+    wrapper.profiled = True
+    return wrapper
+
+
+def _flush():
+    global _buffer
+    with _buffer_lock:
+        if len(_buffer) < settings.PERF_FLUSH_SIZE:
+            return
+        pending, _buffer = _buffer, []
+    try:
+        # An explicit alias skips the router, which would otherwise take
+        # this bookkeeping for a write by the request and pin the client
+        # to the primary.
+        RequestProfile.objects.using(DEFAULT_DB_ALIAS).bulk_create(pending)
+    except DatabaseError:
+        # Profiling must never take a request down with it.
+        logger.exception('Dropped %d request profiles', len(pending))
+
+
+@contextmanager
+def _profiling(profile):
+    _local.profile = profile
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile))
+            yield
+    finally:
+        _local.profile = None
+
+
+class ProfilingMiddleware:
+    """
+    Sample requests at ``PERF_SAMPLE_RATE`` and record wall time, SQL count
+    and time, repeated SQL fingerprints and template render time. Sampled
+    responses carry a ``Server-Timing`` header; samples are buffered and
+    written in batches of ``PERF_FLUSH_SIZE`` for ``manage.py perf_report``.
+
+    A streamed response renders and queries while its body is consumed, so
+    it is profiled until the stream is closed and carries no header, which
+    would have been sent before most of the work.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if not getattr(Template.render, 'profiled', False):
+            Template.render = _timed_render(Template.render)
+
+    def __call__(self, request):
+        if random.random() >= settings.PERF_SAMPLE_RATE:
+            return self.get_response(request)
+
+        profile = Profile()
+        start = time.perf_counter()
+        with _profiling(profile):
+            response = self.get_response(request)
+        if response.streaming:
+            response.streaming_content = self.profile_stream(
+                response.streaming_content, request, response, profile, start
+            )
+            return response
+        total_ms = (time.perf_counter() - start) * 1000
+
+        response['Server-Timing'] = (
+            'total;dur={:.1f}, sql;dur={:.1f};desc="{} queries", render;dur={:.1f}'.format(
+                total_ms, profile.sql_seconds * 1000, profile.sql_count, profile.render_seconds * 1000
+            )
+        )
+        self.record(request, response, profile, total_ms)
+        return response
+
+    def profile_stream(self, content, request, response, profile, start):
+        try:
+            with _profiling(profile):
+                yield from content
+        finally:
+            self.record(request, response, profile, (time.perf_counter() - start) * 1000)
+
+    def record(self, request, response, profile, total_ms):
+        match = request.resolver_match
+        with _buffer_lock:
+            _buffer.append(RequestProfile(
+                view_name=match.view_name if match else request.path,
+                method=request.method,
+                status_code=response.status_code,
+                total_ms=total_ms,
+                sql_count=profile.sql_count,
+                sql_ms=profile.sql_seconds * 1000,
+                render_ms=profile.render_seconds * 1000,
+                duplicate_queries=json.dumps(profile.duplicates()),
+            ))
+        _flush()
@@ -0,0 +1,16 @@
+from django.db import models
+
+
+class RequestProfile(models.Model):
+    view_name = models.CharField(max_length=200)
+    method = models.CharField(max_length=10)
+    status_code = models.PositiveSmallIntegerField()
+    total_ms = models.FloatField()
+    sql_count = models.PositiveIntegerField()
+    sql_ms = models.FloatField()
+    render_ms = models.FloatField()
+    duplicate_queries = models.TextField(blank=True, help_text='JSON object of repeated SQL fingerprints and counts.')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return '{} {:.1f}ms'.format(self.view_name, self.total_ms)
@@ -0,0 +1,50 @@
+import re
+from contextlib import contextmanager
+
+from django.db import connection
+
+# A table read start to finish, as opposed to "SCAN t USING INDEX ..."
+# (an index walk, usually cut short by LIMIT) or a virtual table.
+FULL_SCAN = re.compile(r'^SCAN (?!.*\b(USING|VIRTUAL TABLE)\b)')
+TEMP_SORT = re.compile(r'USE TEMP B-TREE')
+
+
+class PlanRecorder:
+    """Collect the SELECT statements run on a connection, with their parameters."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith('SELECT'):
+            self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def record_queries(using=connection):
+    recorder = PlanRecorder()
+    with using.execute_wrapper(recorder):
+        yield recorder.queries
+
+
+def explain(sql, params, using=connection):
+    """Return the ``EXPLAIN QUERY PLAN`` detail lines for one SQLite query."""
+    with using.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(queries, using=connection):
+    """
+    Return ``(sql, plan line)`` for every step of ``queries`` that scans a
+    whole table or sorts through a temporary B-tree. Full-text queries are
+    exempt: ranking has to sort the matches.
+    """
+    problems = []
+    for sql, params in queries:
+        plan = explain(sql, params, using)
+        if any('VIRTUAL TABLE' in line for line in plan):
+            continue
+        problems.extend((sql, line) for line in plan if FULL_SCAN.search(line) or TEMP_SORT.search(line))
+    return problems
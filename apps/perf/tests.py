@@ -0,0 +1,190 @@
+import json
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from apps.perf.models import RequestProfile
+from apps.perf.queryplan import plan_problems, record_queries
+from apps.tweet.models import Like, Post, TimelineEntry
+from apps.tweet.pagination import encode_cursor
+from apps.tweet.timeline import fan_out_post
+from apps.users.models import Follow, User
+
+
+class SeedBenchmarkTests(TestCase):
+
+    def test_seed_benchmark(self):
+        call_command('seed_benchmark', users=20, posts=50, likes=200, follows_per_user=5, stdout=StringIO())
+        self.assertEqual(User.objects.filter(username__startswith='bench_').count(), 20)
+        self.assertEqual(Post.objects.count(), 50)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(TimelineEntry.objects.exists())
+        post = Post.objects.order_by('-like_count').first()
+        self.assertEqual(post.like_count, Like.objects.filter(post=post).count())
+        user = User.objects.order_by('-followers_count').first()
+        self.assertEqual(user.followers_count, Follow.objects.filter(followee=user).count())
+
+
+class BenchTests(TestCase):
+
+    def test_bench(self):
+        call_command('seed_benchmark', users=20, posts=50, likes=200, follows_per_user=5, stdout=StringIO())
+        out = StringIO()
+        call_command('bench', iterations=2, warmup=1, json=True, stdout=out)
+        results = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(
+            [result['endpoint'] for result in results],
+            [
+                'HomeView', 'UserProfileView', 'LikeTweet', 'UnlikeTweet',
+                'FollowInUserProfile:follow', 'FollowInUserProfile:unfollow',
+            ],
+        )
+        for result in results:
+            self.assertGreater(result['queries'], 0)
+
+
+class BenchRequestOverheadTests(TestCase):
+
+    def test_bench_request_overhead(self):
+        call_command('seed_benchmark', users=5, posts=10, likes=20, follows_per_user=2, stdout=StringIO())
+        out = StringIO()
+        call_command('bench_request_overhead', iterations=2, warmup=1, json=True, stdout=out)
+        results = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([result['mode'] for result in results], ['uncached', 'cached'])
+        self.assertEqual([result['overhead_queries'] for result in results], [2, 0])
+
+
+class BenchLikesTests(TransactionTestCase):
+
+    def test_bench_likes(self):
+        call_command('seed_benchmark', users=4, posts=5, likes=10, follows_per_user=2, stdout=StringIO())
+        out = StringIO()
+        call_command('bench_likes', threads=1, toggles=10, json=True, stdout=out)
+        results = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([result['mode'] for result in results], ['sync', 'buffered'])
+        for result in results:
+            self.assertEqual(result['toggles'], 10)
+            self.assertEqual(result['drift'], 0)
+
+
+class BenchConcurrencyTests(TransactionTestCase):
+
+    def test_bench_concurrency(self):
+        call_command('seed_benchmark', users=4, posts=5, likes=10, follows_per_user=2, stdout=StringIO())
+        likes = Like.objects.count()
+        out = StringIO()
+        call_command('bench_concurrency', threads=2, operations=4, json=True, stdout=out)
+        results = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([result['backend'] for result in results], ['stock', 'tuned'])
+        for result in results:
+            self.assertEqual(result['operations'], 8)
+        # The benchmark writes to copies only.
+        self.assertEqual(Like.objects.count(), likes)
+
+
+class SqliteBackendTests(TestCase):
+
+    def test_pragmas_applied(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+    def test_health_check_replaces_broken_connection(self):
+        connection.ensure_connection()
+        connection.health_check_done = False
+        with mock.patch.object(connection, 'is_usable', return_value=False) as is_usable, \
+                mock.patch.object(connection, 'close') as close:
+            connection.ensure_connection()
+            connection.ensure_connection()
+        self.assertEqual(is_usable.call_count, 1)
+        close.assert_called_once_with()
+
+
+@override_settings(PERF_SAMPLE_RATE=1, PERF_FLUSH_SIZE=1)
+class ProfilingMiddlewareTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('foo', 'foo@example.com', 'testpassword')
+        self.client.login(username='foo', password='testpassword')
+
+    def test_profile_recorded(self):
+        response = self.client.get(reverse('apps.users:home'))
+        self.assertIn('sql;dur=', response['Server-Timing'])
+        profile = RequestProfile.objects.get()
+        self.assertEqual(profile.view_name, 'apps.users:home')
+        self.assertEqual(profile.status_code, 200)
+        self.assertGreater(profile.sql_count, 0)
+        self.assertGreater(profile.render_ms, 0)
+        self.assertEqual(json.loads(profile.duplicate_queries), {})
+
+    @override_settings(STREAMING_PAGES_ENABLED=True, STREAMING_PAGE_SIZE=4, STREAMING_CHUNK_SIZE=1)
+    def test_streamed_response_profiled_until_closed(self):
+        other = User.objects.create_user('bar', 'bar@example.com', 'testpassword')
+        Follow.objects.follow(self.user, other)
+        for i in range(4):
+            fan_out_post(Post.objects.create(title='test{}'.format(i), content='test', user=other))
+        with CaptureQueriesContext(connection) as head:
+            response = self.client.get(reverse('apps.users:home'))
+        self.assertTrue(response.streaming)
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertFalse(RequestProfile.objects.exists())
+        with CaptureQueriesContext(connection) as body:
+            # The test client closes the response once the body is consumed.
+            b''.join(response.streaming_content)
+        self.assertGreaterEqual(len(body), 4)
+        profile = RequestProfile.objects.get()
+        # The last query in the body is the profile's own insert.
+        self.assertEqual(profile.sql_count, len(head) + len(body) - 1)
+        self.assertGreater(profile.render_ms, 0)
+
+    @override_settings(PERF_SAMPLE_RATE=0)
+    def test_unsampled_request(self):
+        response = self.client.get(reverse('apps.users:home'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_perf_report(self):
+        self.client.get(reverse('apps.users:home'))
+        self.client.get(reverse('apps.users:home'))
+        out = StringIO()
+        call_command('perf_report', stdout=out)
+        self.assertIn('apps.users:home requests=2', out.getvalue())
+
+
+@override_settings(TIMELINE_FANOUT_THRESHOLD=3)
+class QueryPlanTests(TestCase):
+    """Every query behind the main views must use an index for filtering and ordering."""
+
+    def setUp(self):
+        call_command('seed_benchmark', users=10, posts=40, likes=80, follows_per_user=4, stdout=StringIO())
+        call_command('update_trending', stdout=StringIO())
+        self.user = User.objects.order_by('-following_count').first()
+        self.client.force_login(self.user)
+        self.target = User.objects.filter(follower_edges__follower=self.user).order_by('-followers_count').first()
+        self.post = Post.objects.filter(user=self.target).first()
+
+    def test_views_avoid_scans_and_sorts(self):
+        urls = [
+            reverse('apps.users:home'),
+            reverse('apps.users:home_feed'),
+            reverse('apps.users:trending'),
+            reverse('apps.users:favorite'),
+            reverse('apps.users:search') + '?q=bench',
+            reverse('apps.users:tweet_detail', kwargs={'pk': self.post.pk}),
+            reverse('apps.users:profile', kwargs={'username': self.target.username}),
+            reverse('apps.users:following_list', kwargs={'username': self.target.username}),
+            reverse('apps.users:followers_list', kwargs={'username': self.target.username}),
+            reverse('apps.api:timeline_since') + '?since=' + encode_cursor(self.post.created_at, self.post.pk),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                with record_queries() as queries:
+                    self.assertEqual(self.client.get(url).status_code, 200)
+                self.assertEqual(plan_problems(queries), [])
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class TweetConfig(AppConfig):
     name = 'apps.tweet'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,14 @@
+from contextlib import contextmanager
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep the created_at values we supply."""
+    fields = [model._meta.get_field('created_at') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
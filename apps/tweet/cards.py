@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.cache import caches
+
+CARD_VARIANTS = ('author', 'plain')
+HITS_KEY = 'tweet_card:stats:hits'
+MISSES_KEY = 'tweet_card:stats:misses'
+
+
+def card_cache():
+    return caches[settings.TWEET_CARD_CACHE]
+
+
+def card_cache_key(post, variant):
+    # created_at guards against a reused primary key serving a stale card,
+    # and the author variant's username against a rename.
+    key = 'tweet_card:{}:{}:{}'.format(variant, post.pk, post.created_at.timestamp())
+    if variant == 'author':
+        key += ':{}'.format(post.user.username)
+    return key
+
+
+def invalidate_card(post):
+    card_cache().delete_many([card_cache_key(post, variant) for variant in CARD_VARIANTS])
+
+
+def record_lookup(hit):
+    if not settings.TWEET_CARD_CACHE_STATS:
+        return
+    cache = card_cache()
+    key = HITS_KEY if hit else MISSES_KEY
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+
+def card_stats():
+    stats = card_cache().get_many([HITS_KEY, MISSES_KEY])
+    return stats.get(HITS_KEY, 0), stats.get(MISSES_KEY, 0)
+
+
+def reset_card_stats():
+    card_cache().delete_many([HITS_KEY, MISSES_KEY])
@@ -0,0 +1,37 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Like, Post
+
+
+def _actual_like_count():
+    return Like.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(
+        count=Count('pk')
+    ).values('count')
+
+
+def reconcile_like_counts(batch_size=1000):
+    """
+    Rewrite ``Post.like_count`` wherever it has drifted from the ``Like``
+    table, walking posts in primary key batches. Returns the number of
+    posts corrected.
+    """
+    actual = _actual_like_count()
+    fixed = 0
+    last_pk = 0
+    while True:
+        pks = list(
+            Post.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            return fixed
+        last_pk = pks[-1]
+        drifted = [
+            Post(pk=pk, like_count=count)
+            for pk, count in Post.objects.filter(pk__in=pks)
+            .annotate(actual=Coalesce(Subquery(actual, output_field=IntegerField()), 0))
+            .exclude(like_count=F('actual'))
+            .values_list('pk', 'actual')
+        ]
+        Post.objects.bulk_update(drifted, ['like_count'])
+        fixed += len(drifted)
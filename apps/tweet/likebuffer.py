@@ -0,0 +1,143 @@
+import atexit
+import logging
+import threading
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .models import Like, Post
+
+logger = logging.getLogger(__name__)
+
+
+class LikeBuffer:
+    """
+    Coalesce like/unlike toggles in memory and write them in batches.
+
+    Only the last requested state of each (user, post) pair is kept, so a
+    burst of toggles on a viral post becomes at most one insert or delete
+    per user and one counter update per post. A background thread flushes
+    every ``LIKE_BUFFER_FLUSH_INTERVAL`` seconds, or sooner once
+    ``LIKE_BUFFER_MAX_PENDING`` pairs are waiting. Toggles still in memory
+    are lost if the process dies before the next flush.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.pending = {}
+        self.pending_delta = Counter()
+        self.in_flight = {}
+        self.in_flight_delta = Counter()
+        self.thread = None
+
+    def set_state(self, user_pk, post_pk, liked, stored_liked, stored_count):
+        """
+        Record that ``user_pk`` wants ``post_pk`` liked or not and return the
+        optimistic like count. ``stored_liked`` and ``stored_count`` are the
+        values the caller just read from the database.
+        """
+        key = (user_pk, post_pk)
+        with self.lock:
+            previous = self.pending.get(key, self.in_flight.get(key, stored_liked))
+            self.pending[key] = liked
+            self.pending_delta[post_pk] += int(liked) - int(previous)
+            count = stored_count + self.pending_delta[post_pk] + self.in_flight_delta[post_pk]
+            full = len(self.pending) >= settings.LIKE_BUFFER_MAX_PENDING
+        if settings.LIKE_BUFFER_FLUSH_INTERVAL:
+            self.start()
+            if full:
+                self.wakeup.set()
+        return max(count, 0)
+
+    def start(self):
+        if self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='like-buffer', daemon=True)
+                self.thread.start()
+                atexit.register(self.flush)
+
+    def run(self):
+        while True:
+            self.wakeup.wait(settings.LIKE_BUFFER_FLUSH_INTERVAL)
+            self.wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """Write every pending toggle in one transaction. Returns the number of pairs written."""
+        with self.flush_lock:
+            return self._flush()
+
+    def _flush(self):
+        with self.lock:
+            if not self.pending:
+                return 0
+            self.in_flight, self.pending = self.pending, {}
+            self.in_flight_delta, self.pending_delta = self.pending_delta, Counter()
+        batch = self.in_flight
+        try:
+            self.write(batch)
+        except IntegrityError:
+            # Retrying would fail the same way and block every later flush.
+            logger.exception('Dropped %d like toggles that violate a constraint', len(batch))
+        except DatabaseError:
+            logger.exception('Failed to flush %d like toggles; retrying on the next flush', len(batch))
+            with self.lock:
+                for key, liked in batch.items():
+                    self.pending.setdefault(key, liked)
+                self.pending_delta.update(self.in_flight_delta)
+                self.in_flight, self.in_flight_delta = {}, Counter()
+            return 0
+        finally:
+            if threading.current_thread() is self.thread:
+                connection.close_if_unusable_or_obsolete()
+        with self.lock:
+            self.in_flight, self.in_flight_delta = {}, Counter()
+        return len(batch)
+
+    def write(self, batch):
+        """
+        Insert and delete the Like rows in ``batch`` and move each post's
+        ``like_count`` by the rows actually changed, never below zero. Drift
+        from other writers is left to ``reconcile_like_counts``.
+        """
+        post_pks = {post_pk for _, post_pk in batch}
+        user_pks = {user_pk for user_pk, _ in batch}
+        delta = Counter()
+        with transaction.atomic():
+            existing = set(Post.objects.filter(pk__in=post_pks).values_list('pk', flat=True))
+            rows = Like.objects.filter(post_id__in=existing, user_id__in=user_pks)
+            stored = {
+                (user_pk, post_pk): like_pk
+                for like_pk, user_pk, post_pk in rows.values_list('pk', 'user_id', 'post_id')
+            }
+            likes = []
+            unliked = []
+            for (user_pk, post_pk), liked in batch.items():
+                if post_pk not in existing:
+                    continue
+                key = (user_pk, post_pk)
+                if liked and key not in stored:
+                    likes.append(Like(user_id=user_pk, post_id=post_pk))
+                    delta[post_pk] += 1
+                elif not liked and key in stored:
+                    unliked.append(stored[key])
+                    delta[post_pk] -= 1
+            if likes:
+                Like.objects.bulk_create(likes, ignore_conflicts=True)
+            if unliked:
+                Like.objects.filter(pk__in=unliked).delete()
+            by_delta = defaultdict(list)
+            for post_pk, change in delta.items():
+                if change:
+                    by_delta[change].append(post_pk)
+            for change, pks in by_delta.items():
+                Post.objects.filter(pk__in=pks).update(like_count=Greatest(F('like_count') + change, 0))
+
+like_buffer = LikeBuffer()
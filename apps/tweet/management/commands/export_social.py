@@ -0,0 +1,50 @@
+import json
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+
+from apps.tweet.models import Like, Post
+from apps.users.models import Follow, User
+
+USER_FIELDS = ('username', 'email', 'password', 'first_name', 'last_name', 'is_active', 'date_joined')
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream users, follows, posts and likes as NDJSON, one record per line, '
+        'reading each table in chunks. Load the file with import_social.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='-', help='File to write; defaults to stdout.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['output'] == '-':
+            self.export(self.stdout, options['batch_size'])
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as out:
+                self.export(out, options['batch_size'])
+
+    def export(self, out, batch_size):
+        # Users are referenced by username so records can be merged into a
+        # database whose user ids differ; posts keep their exported id.
+        tables = [
+            ('user', USER_FIELDS, User.objects.values_list(*USER_FIELDS)),
+            ('follow', ('follower', 'followee', 'created_at'), Follow.objects.values_list(
+                'follower__username', 'followee__username', 'created_at',
+            )),
+            ('post', ('id', 'user', 'title', 'content', 'created_at'), Post.objects.values_list(
+                'id', 'user__username', 'title', 'content', 'created_at',
+            )),
+            ('like', ('user', 'post', 'created_at'), Like.objects.values_list('user__username', 'post', 'created_at')),
+        ]
+        counts = []
+        for record_type, fields, rows in tables:
+            written = 0
+            for row in rows.order_by('pk').iterator(chunk_size=batch_size):
+                record = dict(zip(fields, row), type=record_type)
+                out.write(json.dumps(record, default=datetime.isoformat, ensure_ascii=False) + '\n')
+                written += 1
+            counts.append('{} {}s'.format(written, record_type))
+        self.stderr.write('Exported {}.'.format(', '.join(counts)))
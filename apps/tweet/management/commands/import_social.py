@@ -0,0 +1,203 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils.dateparse import parse_datetime
+
+from apps.tweet.bulk import explicit_timestamps
+from apps.tweet.counters import reconcile_like_counts
+from apps.tweet.models import Like, Post
+from apps.tweet.search import get_search_backend
+from apps.users.counters import reconcile_follow_counts
+from apps.users.models import Follow, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Load an export_social NDJSON file in batches. Users are matched by username '
+        'and post ids are shifted past the existing ones. With --checkpoint, an '
+        'interrupted import resumes after the last committed batch.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--checkpoint', help='File recording progress, for resuming.')
+
+    def handle(self, *args, **options):
+        self.checkpoint_path = options['checkpoint']
+        self.state = self.load_checkpoint()
+        self.skipped = 0
+        batch_size = options['batch_size']
+
+        if self.state['post_offset'] is None:
+            self.reserve_post_ids(*self.exported_post_range(options['path']))
+
+        batch_type = None
+        batch = []
+        with open(options['path'], encoding='utf-8') as records:
+            for line_number, line in enumerate(records, 1):
+                if line_number <= self.state['line']:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    raise CommandError('Line {} is not valid JSON.'.format(line_number))
+                if batch and (record['type'] != batch_type or len(batch) == batch_size):
+                    self.load(batch_type, batch, line_number - 1)
+                    batch = []
+                batch_type = record['type']
+                batch.append(record)
+            if batch:
+                self.load(batch_type, batch, line_number)
+
+        reconcile_follow_counts(batch_size)
+        reconcile_like_counts(batch_size)
+        self.stdout.write(
+            'Imported up to line {}; skipped {} records with unknown users or posts. '
+            'Run rebuild_timelines to fill home timelines.'.format(self.state['line'], self.skipped)
+        )
+
+    def load_checkpoint(self):
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as checkpoint:
+                return json.load(checkpoint)
+        return {'line': 0, 'post_offset': None}
+
+    def save_checkpoint(self, line_number):
+        self.state['line'] = line_number
+        if self.checkpoint_path:
+            with open(self.checkpoint_path, 'w') as checkpoint:
+                json.dump(self.state, checkpoint)
+
+    def load(self, record_type, batch, last_line):
+        """
+        Write one batch and advance the checkpoint. Every insert ignores
+        conflicts, so replaying a batch committed just before a crash is a
+        no-op.
+        """
+        loader = getattr(self, 'load_{}s'.format(record_type), None)
+        if loader is None:
+            raise CommandError("Unknown record type '{}' before line {}.".format(record_type, last_line))
+        with transaction.atomic():
+            loader(batch)
+        self.save_checkpoint(last_line)
+
+    def user_ids(self, usernames):
+        return dict(User.objects.filter(username__in=set(usernames)).values_list('username', 'pk'))
+
+    def exported_post_range(self, path):
+        """Return the first and last exported post ids in ``path``, or ``(None, None)``."""
+        first = last = None
+        with open(path, encoding='utf-8') as records:
+            for line in records:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get('type') == 'post':
+                    first = record['id'] if first is None else first
+                    last = record['id']
+        return first, last
+
+    def reserve_post_ids(self, first_exported_id, last_exported_id):
+        # Posts are exported in id order, so one offset past the existing ids
+        # maps them all without holding an id table in memory. The id
+        # sequence is pushed past the whole shifted range before any post is
+        # written, by inserting and deleting a placeholder at its top, so
+        # posts created during the import cannot take an id an imported post
+        # needs. The offset is saved so a resumed run reuses it.
+        if first_exported_id is None:
+            return
+        placeholder_user = User.objects.values_list('pk', flat=True).first()
+        with transaction.atomic():
+            existing = Post.objects.aggregate(max_id=Max('pk'))['max_id'] or 0
+            offset = max(existing - first_exported_id + 1, 0)
+            top = last_exported_id + offset
+            if placeholder_user is not None:
+                Post.objects.bulk_create([Post(pk=top, user_id=placeholder_user, title='', content='')])
+                with connection.cursor() as cursor:
+                    for sql in connection.ops.sequence_reset_sql(no_style(), [Post]):
+                        cursor.execute(sql)
+                    # A raw delete: the placeholder was never indexed or cached.
+                    cursor.execute('DELETE FROM {} WHERE {} = %s'.format(
+                        connection.ops.quote_name(Post._meta.db_table),
+                        connection.ops.quote_name(Post._meta.pk.column),
+                    ), [top])
+        self.state['post_offset'] = offset
+        self.save_checkpoint(self.state['line'])
+
+    def post_id(self, exported_id):
+        return exported_id + self.state['post_offset']
+
+    def load_users(self, batch):
+        User.objects.bulk_create([
+            User(
+                username=record['username'],
+                email=record['email'],
+                password=record['password'],
+                first_name=record['first_name'],
+                last_name=record['last_name'],
+                is_active=record['is_active'],
+                date_joined=parse_datetime(record['date_joined']),
+            )
+            for record in batch
+        ], ignore_conflicts=True)
+
+    def load_follows(self, batch):
+        ids = self.user_ids([record['follower'] for record in batch] + [record['followee'] for record in batch])
+        follows = []
+        for record in batch:
+            if record['follower'] not in ids or record['followee'] not in ids:
+                self.skipped += 1
+                continue
+            follows.append(Follow(
+                follower_id=ids[record['follower']],
+                followee_id=ids[record['followee']],
+                created_at=parse_datetime(record['created_at']),
+            ))
+        with explicit_timestamps(Follow):
+            Follow.objects.bulk_create(follows, ignore_conflicts=True)
+
+    def load_posts(self, batch):
+        ids = self.user_ids(record['user'] for record in batch)
+        posts = []
+        for record in batch:
+            if record['user'] not in ids:
+                self.skipped += 1
+                continue
+            posts.append(Post(
+                pk=self.post_id(record['id']),
+                user_id=ids[record['user']],
+                title=record['title'],
+                content=record['content'],
+                created_at=parse_datetime(record['created_at']),
+            ))
+        with explicit_timestamps(Post):
+            Post.objects.bulk_create(posts, ignore_conflicts=True)
+        # bulk_create skips the post_save receiver that feeds the search index.
+        get_search_backend().index(posts)
+
+    def load_likes(self, batch):
+        if self.state['post_offset'] is None:
+            self.skipped += len(batch)
+            return
+        ids = self.user_ids(record['user'] for record in batch)
+        post_ids = set(Post.objects.filter(
+            pk__in=[self.post_id(record['post']) for record in batch]
+        ).values_list('pk', flat=True))
+        likes = []
+        for record in batch:
+            if record['user'] not in ids or self.post_id(record['post']) not in post_ids:
+                self.skipped += 1
+                continue
+            likes.append(Like(
+                user_id=ids[record['user']],
+                post_id=self.post_id(record['post']),
+                created_at=parse_datetime(record['created_at']),
+            ))
+        with explicit_timestamps(Like):
+            Like.objects.bulk_create(likes, ignore_conflicts=True)
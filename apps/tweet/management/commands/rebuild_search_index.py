@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.tweet.models import Post
+from apps.tweet.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Clear the post search index and re-index every post in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.SEARCH_INDEX_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        batch_size = options['batch_size']
+        backend.clear()
+        indexed = 0
+        batch = []
+        for post in Post.objects.order_by('pk').only('title', 'content').iterator(chunk_size=batch_size):
+            batch.append(post)
+            if len(batch) == batch_size:
+                backend.index(batch)
+                indexed += len(batch)
+                batch = []
+        backend.index(batch)
+        indexed += len(batch)
+        self.stdout.write('Indexed {} posts.'.format(indexed))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from apps.tweet.timeline import backfill_timeline
+from apps.users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Backfill every home timeline from the author and the accounts they follow.'
+
+    def handle(self, *args, **options):
+        rebuilt = 0
+        for owner in User.objects.order_by('pk').iterator():
+            backfill_timeline(owner, owner)
+            for followee in User.objects.filter(follower_edges__follower=owner).iterator():
+                backfill_timeline(owner, followee)
+            rebuilt += 1
+        self.stdout.write('Rebuilt {} timelines.'.format(rebuilt))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.tweet.counters import reconcile_like_counts
+
+
+class Command(BaseCommand):
+    help = 'Recompute Post.like_count from the Like table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        fixed = reconcile_like_counts(batch_size=options['batch_size'])
+        self.stdout.write('Reconciled like counts for {} posts.'.format(fixed))
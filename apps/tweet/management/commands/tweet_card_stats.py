@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from apps.tweet.cards import card_stats, reset_card_stats
+
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counts for the tweet card fragment cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zero the counters after printing them.')
+
+    def handle(self, *args, **options):
+        hits, misses = card_stats()
+        lookups = hits + misses
+        ratio = hits / lookups if lookups else 0
+        self.stdout.write('hits={} misses={} hit_ratio={:.1%}'.format(hits, misses, ratio))
+        if options['reset']:
+            reset_card_stats()
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.tweet.trending import update_trending
+
+
+class Command(BaseCommand):
+    help = 'Decay trending scores and fold in likes created since the last run. Meant to run every few minutes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        read = update_trending(batch_size=options['batch_size'])
+        self.stdout.write('Read {} new likes.'.format(read))
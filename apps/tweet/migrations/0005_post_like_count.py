@@ -0,0 +1,30 @@
+# Generated by Django 2.2.28 on 2026-10-18 15:46
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_like_count(apps, schema_editor):
+    Like = apps.get_model('tweet', 'Like')
+    Post = apps.get_model('tweet', 'Post')
+    actual = Like.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(
+        count=Count('pk')
+    ).values('count')
+    Post.objects.update(like_count=Coalesce(Subquery(actual, output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tweet', '0004_post_created_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_like_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.28 on 2026-10-18 15:49
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def dedupe_likes(apps, schema_editor):
+    Like = apps.get_model('tweet', 'Like')
+    Post = apps.get_model('tweet', 'Post')
+    keep = Like.objects.order_by().values('user', 'post').annotate(keep=Min('pk')).values('keep')
+    Like.objects.exclude(pk__in=keep).delete()
+    actual = Like.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(
+        count=Count('pk')
+    ).values('count')
+    Post.objects.update(like_count=Coalesce(Subquery(actual, output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tweet', '0006_timelineentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_likes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='like',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='tweet_like_user_post_uniq'),
+        ),
+    ]
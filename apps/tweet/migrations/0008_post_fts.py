@@ -0,0 +1,30 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:02
+
+from django.db import migrations
+
+
+def create_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    # Text is tokenized in Python (see apps.tweet.search.tokenize), so the
+    # table only needs to split on the spaces between stored tokens.
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE tweet_post_fts USING fts5(title, content, tokenize='unicode61')"
+    )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS tweet_post_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tweet', '0007_like_user_post_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.28 on 2026-10-18 16:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tweet', '0009_trending'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='trendingscore',
+            name='tweet_trending_score_idx',
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['post', 'created_at'], name='tweet_like_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='tweet_post_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trendingscore',
+            index=models.Index(fields=['-score', '-post'], name='tweet_trending_rank_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.28 on 2026-10-18 16:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tweet', '0010_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='tweet_like_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:05
+
+from django.db import migrations
+
+
+def add_chars_column(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    # FTS5 tables cannot be altered; rebuild with the extra column and
+    # fill it from the posts.
+    from apps.tweet.search import cjk_chars
+
+    Post = apps.get_model('tweet', 'Post')
+    schema_editor.execute('ALTER TABLE tweet_post_fts RENAME TO tweet_post_fts_old')
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE tweet_post_fts USING fts5(title, content, chars, tokenize='unicode61')"
+    )
+    schema_editor.execute(
+        'INSERT INTO tweet_post_fts (rowid, title, content, chars) '
+        "SELECT rowid, title, content, '' FROM tweet_post_fts_old"
+    )
+    schema_editor.execute('DROP TABLE tweet_post_fts_old')
+    with schema_editor.connection.cursor() as cursor:
+        for pk, title, content in Post.objects.values_list('pk', 'title', 'content').iterator():
+            cursor.execute(
+                'UPDATE tweet_post_fts SET chars = %s WHERE rowid = %s',
+                [' '.join(cjk_chars(title + ' ' + content)), pk],
+            )
+
+
+def drop_chars_column(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('ALTER TABLE tweet_post_fts RENAME TO tweet_post_fts_old')
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE tweet_post_fts USING fts5(title, content, tokenize='unicode61')"
+    )
+    schema_editor.execute(
+        'INSERT INTO tweet_post_fts (rowid, title, content) SELECT rowid, title, content FROM tweet_post_fts_old'
+    )
+    schema_editor.execute('DROP TABLE tweet_post_fts_old')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tweet', '0011_like_user_created_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_chars_column, drop_chars_column),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.28 on 2026-10-18 16:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def reset_trending(apps, schema_editor):
+    # Existing scores have no votes to take unlikes back out of; the next
+    # update_trending run rebuilds them from the Like table.
+    apps.get_model('tweet', 'TrendingScore').objects.all().delete()
+    apps.get_model('tweet', 'TrendingState').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tweet', '0012_post_fts_chars'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingVote',
+            fields=[
+                ('like_id', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tweet.Post')),
+            ],
+        ),
+        migrations.RunPython(reset_trending, migrations.RunPython.noop),
+    ]
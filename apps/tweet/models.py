@@ -1,23 +1,161 @@
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.db.models import Exists, F, OuterRef, Value
+from django.db.models.functions import Greatest
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
 
+class PostQuerySet(models.QuerySet):
+
+    def for_feed(self, viewer):
+        """
+        Posts ready to render as tweet cards: the author is joined in and
+        ``liked`` tells whether ``viewer`` has liked each post.
+        """
+        return self.select_related('user').with_liked(viewer)
+
+    def with_liked(self, viewer):
+        """Annotate ``liked``: whether ``viewer`` has liked each post."""
+        if viewer is None or not viewer.is_authenticated:
+            return self.annotate(liked=Value(False, output_field=models.BooleanField()))
+        return self.annotate(liked=Exists(Like.objects.filter(user=viewer, post=OuterRef('pk'))))
+
+
 class Post(models.Model):
     title = models.CharField(max_length=100)
     content = models.TextField()
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
+    like_count = models.PositiveIntegerField(default=0)
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return self.title
 
     class Meta:
-        ordering = ["-created_at"]
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='tweet_post_created_id_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='tweet_post_user_created_idx'),
+        ]
+
+
+class TimelineEntry(models.Model):
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timeline_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'post'], name='tweet_timelineentry_owner_post_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-post'], name='tweet_timeline_owner_idx'),
+        ]
+
+
+class LikeManager(models.Manager):
+
+    @property
+    def write_db(self):
+        return self._db or router.db_for_write(self.model)
+
+    def like(self, user, post_pk):
+        """
+        Insert the like if it is missing in a single conflict-ignoring
+        statement and bump the post's counter only when a row was added.
+        Returns whether the like was created.
+        """
+        db = self.write_db
+        connection = connections[db]
+        opts = self.model._meta
+        sql = '{} {} ({}, {}, {}) SELECT %s, {}, %s FROM {} WHERE {} = %s{}'.format(
+            connection.ops.insert_statement(ignore_conflicts=True),
+            connection.ops.quote_name(opts.db_table),
+            connection.ops.quote_name(opts.get_field('user').column),
+            connection.ops.quote_name(opts.get_field('post').column),
+            connection.ops.quote_name(opts.get_field('created_at').column),
+            connection.ops.quote_name(Post._meta.pk.column),
+            connection.ops.quote_name(Post._meta.db_table),
+            connection.ops.quote_name(Post._meta.pk.column),
+            connection.ops.ignore_conflicts_suffix_sql(ignore_conflicts=True),
+        )
+        params = [user.pk, connection.ops.adapt_datetimefield_value(timezone.now()), post_pk]
+        with transaction.atomic(using=db):
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                created = cursor.rowcount == 1
+            if created:
+                Post.objects.using(db).filter(pk=post_pk).update(like_count=F('like_count') + 1)
+        return created
+
+    def liked_post_pks(self, user, post_pks):
+        """
+        Return the pks among ``post_pks`` that ``user`` has liked, resolved
+        with a single query bounded by the rendered page.
+        """
+        if not post_pks:
+            return set()
+        return set(self.filter(user=user, post__in=post_pks).values_list('post', flat=True))
+
+    def unlike(self, user, post_pk):
+        db = self.write_db
+        with transaction.atomic(using=db):
+            deleted, _ = self.using(db).filter(user=user, post_id=post_pk).delete()
+            if deleted:
+                Post.objects.using(db).filter(pk=post_pk).update(
+                    like_count=Greatest(F('like_count') - deleted, 0)
+                )
+        return bool(deleted)
 
 
 class Like(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     post = models.ForeignKey(Post, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = LikeManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'], name='tweet_like_user_post_uniq'),
+        ]
+        # (user, post) lookups use the unique constraint's index.
+        indexes = [
+            models.Index(fields=['post', 'created_at'], name='tweet_like_post_created_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='tweet_like_user_created_idx'),
+        ]
+
+
+class TrendingScore(models.Model):
+    """
+    Time-decayed like score of a trending candidate, as of
+    ``TrendingState.computed_at``. Maintained by ``apps.tweet.trending``.
+    """
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True, related_name='trending_score')
+    score = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score', '-post'], name='tweet_trending_rank_idx'),
+        ]
+
+
+class TrendingVote(models.Model):
+    """
+    A like counted in a candidate's ``TrendingScore``. ``like_id`` is not a
+    foreign key: the vote outlives an unlike so its weight can be taken
+    back out of the score.
+    """
+    like_id = models.PositiveIntegerField(primary_key=True)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField()
+
+
+class TrendingState(models.Model):
+    """Single row recording how far ``update_trending`` has read the ``Like`` table."""
+    last_like_id = models.PositiveIntegerField(default=0)
+    computed_at = models.DateTimeField(null=True)
@@ -0,0 +1,30 @@
+import threading
+
+
+class PostNotifier:
+    """
+    Wakes long-polling requests when a post has been fanned out. Only
+    waiters in the same process are woken; the others find the post at
+    their next ``LONG_POLL_INTERVAL`` check.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.version = 0
+
+    def notify(self):
+        with self.condition:
+            self.version += 1
+            self.condition.notify_all()
+
+    def wait(self, version, timeout):
+        """
+        Block until a post is announced after ``version`` was read, or
+        ``timeout`` seconds pass. Return the current version.
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+
+new_posts = PostNotifier()
@@ -0,0 +1,94 @@
+import base64
+import binascii
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at, pk):
+    raw = '{}|{}'.format(created_at.isoformat(), pk).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, pk = raw.decode().split('|')
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(cursor)
+    if created_at is None:
+        raise InvalidCursor(cursor)
+    return created_at, pk
+
+
+def keyset_filter(queryset, cursor, created_field='created_at', pk_field='id'):
+    """
+    Restrict ``queryset`` to rows strictly after ``cursor`` in
+    ``(-created_field, -pk_field)`` order. The leading ``<=`` keeps the
+    lookup a range scan on the composite index.
+    """
+    created_at, pk = decode_cursor(cursor)
+    return queryset.filter(
+        Q(**{created_field + '__lt': created_at}) | Q(**{pk_field + '__lt': pk}),
+        **{created_field + '__lte': created_at}
+    )
+
+
+def keyset_newer_filter(queryset, cursor, created_field='created_at', pk_field='id'):
+    """Restrict ``queryset`` to rows strictly newer than ``cursor``; the mirror of ``keyset_filter``."""
+    created_at, pk = decode_cursor(cursor)
+    return queryset.filter(
+        Q(**{created_field + '__gt': created_at}) | Q(**{pk_field + '__gt': pk}),
+        **{created_field + '__gte': created_at}
+    )
+
+
+def paginate_keyset(queryset, cursor=None, page_size=None, created_field='created_at', pk_field='id'):
+    page_size = page_size or settings.TIMELINE_PAGE_SIZE
+    if cursor:
+        queryset = keyset_filter(queryset, cursor, created_field, pk_field)
+    queryset = queryset.order_by('-' + created_field, '-' + pk_field)
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        if isinstance(last, dict):
+            next_cursor = encode_cursor(last[created_field], last[pk_field])
+        else:
+            next_cursor = encode_cursor(getattr(last, created_field), getattr(last, pk_field))
+    return items, next_cursor
+
+
+def stream_keyset(queryset, cursor=None, page_size=None, chunk_size=100, created_field='created_at', pk_field='id'):
+    """
+    Like ``paginate_keyset``, but the page comes back as an iterator that
+    reads ``chunk_size`` rows at a time. The next cursor is found up front
+    from the keys of the page's last row and the one after it.
+    """
+    page_size = page_size or settings.TIMELINE_PAGE_SIZE
+    if cursor:
+        queryset = keyset_filter(queryset, cursor, created_field, pk_field)
+    queryset = queryset.order_by('-' + created_field, '-' + pk_field)
+    edge = list(queryset.values_list(created_field, pk_field)[page_size - 1:page_size + 1])
+    next_cursor = encode_cursor(*edge[0]) if len(edge) > 1 else None
+    return queryset[:page_size].iterator(chunk_size=chunk_size), next_cursor
+
+
+class CountedPaginator(Paginator):
+    """
+    Paginator that takes its total from a maintained counter instead of
+    issuing ``COUNT(*)`` over the object list.
+    """
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count = count
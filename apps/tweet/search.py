@@ -0,0 +1,141 @@
+import base64
+import binascii
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+from .pagination import InvalidCursor
+
+# Runs of Japanese script are indexed as overlapping bigrams since they
+# carry no word boundaries; everything else splits on non-word characters.
+CJK_RUN = re.compile(r'[぀-ヿ㐀-䶿一-鿿豈-﫿ｦ-ﾟ]+')
+WORD = re.compile(r'[^\W_]+')
+
+
+def tokenize(text):
+    text = unicodedata.normalize('NFKC', text).lower()
+    tokens = []
+    position = 0
+    for match in CJK_RUN.finditer(text):
+        tokens.extend(WORD.findall(text[position:match.start()]))
+        run = match.group()
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        position = match.end()
+    tokens.extend(WORD.findall(text[position:]))
+    return tokens
+
+
+def cjk_chars(text):
+    """
+    The distinct Japanese characters of ``text``. Bigrams cannot match a
+    one-character query, so these are indexed in a column of their own.
+    """
+    text = unicodedata.normalize('NFKC', text).lower()
+    return sorted(set(''.join(CJK_RUN.findall(text))))
+
+
+def encode_search_cursor(score, pk):
+    return base64.urlsafe_b64encode('{!r}|{}'.format(score, pk).encode()).decode().rstrip('=')
+
+
+def decode_search_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        score, pk = raw.decode().split('|')
+        return float(score), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(cursor)
+
+
+class SearchBackend:
+    """Interface for post search indexes."""
+
+    def index(self, posts):
+        raise NotImplementedError
+
+    def remove(self, post_pks):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def search(self, query, cursor=None, limit=None):
+        """
+        Return ``(post_pks, next_cursor)`` for one page of results, best
+        match first.
+        """
+        raise NotImplementedError
+
+
+class SqliteFTS5Backend(SearchBackend):
+    table = 'tweet_post_fts'
+    # bm25 column weights: a title hit counts double.
+    rank = 'bm25(tweet_post_fts, 2.0, 1.0, 1.0)'
+
+    def index(self, posts):
+        rows = [
+            (
+                post.pk,
+                ' '.join(tokenize(post.title)),
+                ' '.join(tokenize(post.content)),
+                ' '.join(cjk_chars(post.title + ' ' + post.content)),
+            )
+            for post in posts
+        ]
+        if not rows:
+            return
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany('DELETE FROM tweet_post_fts WHERE rowid = %s', [(row[0],) for row in rows])
+            cursor.executemany('INSERT INTO tweet_post_fts (rowid, title, content, chars) VALUES (%s, %s, %s, %s)', rows)
+
+    def remove(self, post_pks):
+        with connection.cursor() as cursor:
+            cursor.executemany('DELETE FROM tweet_post_fts WHERE rowid = %s', [(pk,) for pk in post_pks])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM tweet_post_fts')
+
+    def match_expression(self, query):
+        # Each whitespace-separated term must appear as a phrase of its
+        # tokens; a lone Japanese character is looked up in ``chars``.
+        phrases = []
+        for term in query.split():
+            tokens = tokenize(term)
+            if len(tokens) == 1 and len(tokens[0]) == 1 and CJK_RUN.match(tokens[0]):
+                phrases.append('chars : "{}"'.format(tokens[0]))
+            elif tokens:
+                phrases.append('"{}"'.format(' '.join(tokens)))
+        return ' '.join(phrases)
+
+    def search(self, query, cursor=None, limit=None):
+        limit = limit or settings.SEARCH_PAGE_SIZE
+        match = self.match_expression(query)
+        if not match:
+            return [], None
+        sql = 'SELECT rowid, {rank} AS score FROM tweet_post_fts WHERE tweet_post_fts MATCH %s'.format(rank=self.rank)
+        params = [match]
+        if cursor:
+            score, pk = decode_search_cursor(cursor)
+            sql += ' AND ({rank} > %s OR ({rank} = %s AND rowid > %s))'.format(rank=self.rank)
+            params += [score, score, pk]
+        sql += ' ORDER BY score, rowid LIMIT %s'
+        params.append(limit + 1)
+        with connection.cursor() as db_cursor:
+            db_cursor.execute(sql, params)
+            rows = db_cursor.fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_search_cursor(rows[-1][1], rows[-1][0])
+        return [pk for pk, _ in rows], next_cursor
+
+
+def get_search_backend():
+    return import_string(settings.SEARCH_BACKEND)()
@@ -0,0 +1,24 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.jobs.queue import enqueue
+
+from .cards import invalidate_card
+from .models import Post
+from .tasks import index_posts, unindex_posts
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_card(sender, instance, **kwargs):
+    invalidate_card(instance)
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        enqueue(index_posts, post_pks=[instance.pk])
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    enqueue(unindex_posts, post_pks=[instance.pk])
@@ -0,0 +1,26 @@
+from django.http import StreamingHttpResponse
+from django.template.loader import get_template, render_to_string
+from django.utils.safestring import mark_safe
+
+# Page templates print this where the cards go; it renders as nothing
+# when the page is not streamed.
+CARDS_SLOT = mark_safe('<!-- tweet cards -->')
+
+
+def stream_cards(request, template_name, context, posts, show_author):
+    """
+    Render ``template_name`` around ``posts`` as a streaming response: the
+    page up to ``{{ cards_slot }}`` is sent first, then one tweet card per
+    post as ``posts`` is consumed, then the rest of the page.
+    """
+    page = render_to_string(template_name, dict(context, cards_slot=CARDS_SLOT), request)
+    head, tail = page.split(CARDS_SLOT, 1)
+    card = get_template('tweet/tweet_card.html')
+
+    def chunks():
+        yield head
+        for post in posts:
+            yield card.render({'post': post, 'show_author': show_author})
+        yield tail
+
+    return StreamingHttpResponse(chunks(), content_type='text/html; charset=utf-8')
@@ -0,0 +1,45 @@
+from django.db import transaction
+
+from apps.jobs.queue import task
+from apps.users.models import Follow, User
+
+from .models import Post
+from .notify import new_posts
+from .search import get_search_backend
+from .timeline import backfill_timeline, fan_out_post, remove_from_timeline
+
+
+@task
+def fan_out(post_pk):
+    post = Post.objects.select_related('user').filter(pk=post_pk).first()
+    if post is not None:
+        fan_out_post(post)
+        # Long polls wake to read timelines, so only once the entries are in.
+        transaction.on_commit(new_posts.notify)
+
+
+@task
+def sync_followed_author(owner_pk, author_pk):
+    """
+    Backfill or clear ``author``'s posts in ``owner``'s timeline to match
+    whether ``owner`` follows ``author`` now, so follow and unfollow jobs
+    may run in any order.
+    """
+    users = User.objects.in_bulk([owner_pk, author_pk])
+    if owner_pk not in users or author_pk not in users:
+        return
+    owner, author = users[owner_pk], users[author_pk]
+    if Follow.objects.filter(follower=owner, followee=author).exists():
+        backfill_timeline(owner, author)
+    else:
+        remove_from_timeline(owner, author)
+
+
+@task
+def index_posts(post_pks):
+    get_search_backend().index(Post.objects.filter(pk__in=post_pks).only('pk', 'title', 'content'))
+
+
+@task
+def unindex_posts(post_pks):
+    get_search_backend().remove(post_pks)
@@ -0,0 +1,41 @@
+from django import template
+from django.conf import settings
+
+from apps.tweet.cards import card_cache, card_cache_key, record_lookup
+
+register = template.Library()
+
+
+class TweetCardNode(template.Node):
+
+    def __init__(self, nodelist, post, show_author):
+        self.nodelist = nodelist
+        self.post = post
+        self.show_author = show_author
+
+    def render(self, context):
+        post = self.post.resolve(context)
+        variant = 'author' if self.show_author.resolve(context) else 'plain'
+        cache = card_cache()
+        key = card_cache_key(post, variant)
+        fragment = cache.get(key)
+        record_lookup(fragment is not None)
+        if fragment is None:
+            fragment = self.nodelist.render(context)
+            cache.set(key, fragment, settings.TWEET_CARD_CACHE_TIMEOUT)
+        return fragment
+
+
+@register.tag
+def tweetcard(parser, token):
+    """
+    Cache the viewer-independent part of a tweet card per post::
+
+        {% tweetcard post show_author %} ... {% endtweetcard %}
+    """
+    bits = token.split_contents()
+    if len(bits) != 3:
+        raise template.TemplateSyntaxError("'%s' tag takes a post and a show_author flag." % bits[0])
+    nodelist = parser.parse(('endtweetcard',))
+    parser.delete_first_token()
+    return TweetCardNode(nodelist, parser.compile_filter(bits[1]), parser.compile_filter(bits[2]))
@@ -1,11 +1,31 @@
 import json
+import os
+import shutil
+import tempfile
+import threading
 import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 
-from apps.tweet.models import Like, Post
+from apps.jobs.queue import run_pending
+from apps.tweet.cards import card_cache, card_cache_key, card_stats
+from apps.tweet.likebuffer import like_buffer
+from apps.tweet.management.commands.import_social import Command as ImportSocialCommand
+from apps.tweet.models import Like, Post, TimelineEntry, TrendingScore
+from apps.tweet.notify import PostNotifier
+from apps.tweet.search import get_search_backend, tokenize
+from apps.tweet.timeline import fan_out_post
+from apps.tweet.trending import update_trending
+from apps.users.models import Follow
 
 User = get_user_model()
 
@@ -26,7 +46,27 @@ class TweetCreateTests(TestCase):
         post_response = self.client.post(self.url, {'title': 'test','content':'test'})
         self.assertEqual(Post.objects.count(), 1)
         self.assertRedirects(post_response, reverse('apps.users:profile', kwargs={'username': self.user.username}))
+
+    def test_tweet_create_fans_out_to_followers(self):
+        follower = User.objects.create_user('bar', 'bar@example.com', 'testpassword')
+        Follow.objects.follow(follower, self.user)
+        self.client.post(self.url, {'title': 'test','content':'test'})
+        post = Post.objects.get()
+        self.assertTrue(TimelineEntry.objects.filter(owner=self.user, post=post).exists())
+        self.assertTrue(TimelineEntry.objects.filter(owner=follower, post=post).exists())
     
+    @override_settings(JOB_QUEUE_ENABLED=True)
+    def test_tweet_create_queues_side_effects(self):
+        follower = User.objects.create_user('bar', 'bar@example.com', 'testpassword')
+        Follow.objects.follow(follower, self.user)
+        self.client.post(self.url, {'title': 'queued','content':'test'})
+        post = Post.objects.get()
+        self.assertFalse(TimelineEntry.objects.filter(owner=follower).exists())
+        self.assertEqual(get_search_backend().search('queued')[0], [])
+        self.assertEqual(run_pending(), 2)
+        self.assertTrue(TimelineEntry.objects.filter(owner=follower, post=post).exists())
+        self.assertEqual(get_search_backend().search('queued')[0], [post.pk])
+
     def test_tweet_create_failure_by_empty_field(self):
         post_response = self.client.post(self.url, {'title': 'test','content':''})
         self.assertFormError(post_response, 'form', 'content', 'このフィールドは必須です。')
@@ -37,9 +77,14 @@ class TweetListTests(TestCase):
     def setUp(self):
         self.user1 = User.objects.create_user('foo1', 'foo1@example.com', 'testpassword')
         self.user2 = User.objects.create_user('foo2', 'foo2@example.com', 'testpassword')
+        self.user3 = User.objects.create_user('foo3', 'foo3@example.com', 'testpassword')
+        Follow.objects.follow(self.user1, self.user2)
         self.tweet1 = Post.objects.create(title='test1', content='test1', user=self.user1)
         time.sleep(0.3)
         self.tweet2 = Post.objects.create(title='test2', content='test2', user=self.user2)
+        self.tweet3 = Post.objects.create(title='test3', content='test3', user=self.user3)
+        for tweet in (self.tweet1, self.tweet2, self.tweet3):
+            fan_out_post(tweet)
         self.url = reverse('apps.users:home')
     
     def test_tweet_list_get(self):
@@ -56,6 +101,125 @@ class TweetListTests(TestCase):
         self.assertContains(response, self.tweet1.title)
         self.assertContains(response, self.user2.username)
         self.assertContains(response, self.tweet2.title)
+        self.assertNotContains(response, self.tweet3.title)
+
+    @override_settings(TIMELINE_FANOUT_THRESHOLD=0)
+    def test_tweet_list_merges_unfanned_followees(self):
+        self.user2.refresh_from_db()
+        tweet = Post.objects.create(title='test4', content='test4', user=self.user2)
+        fan_out_post(tweet)
+        self.assertFalse(TimelineEntry.objects.filter(owner=self.user1, post=tweet).exists())
+        self.client.login(username='foo1', password='testpassword')
+        response = self.client.get(self.url)
+        self.assertQuerysetEqual(
+            response.context['post_list'],
+            ['<Post: test4>', '<Post: test2>', '<Post: test1>'],
+            ordered = True
+        )
+
+    @override_settings(TIMELINE_PAGE_SIZE=1)
+    def test_tweet_list_pagination(self):
+        self.client.login(username='foo1', password='testpassword')
+        response = self.client.get(self.url)
+        self.assertQuerysetEqual(response.context['post_list'], ['<Post: test2>'])
+        next_cursor = response.context['next_cursor']
+        self.assertIsNotNone(next_cursor)
+        response = self.client.get(self.url, {'cursor': next_cursor})
+        self.assertQuerysetEqual(response.context['post_list'], ['<Post: test1>'])
+        self.assertIsNone(response.context['next_cursor'])
+
+    def test_tweet_list_invalid_cursor(self):
+        self.client.login(username='foo1', password='testpassword')
+        response = self.client.get(self.url, {'cursor': 'invalid'})
+        self.assertEquals(response.status_code, 400)
+
+    @override_settings(TIMELINE_PAGE_SIZE=1)
+    def test_tweet_feed_get(self):
+        self.client.login(username='foo1', password='testpassword')
+        response = self.client.get(reverse('apps.users:home_feed'))
+        self.assertEquals(response.status_code, 200)
+        content = json.loads(response.content)
+        self.assertEqual([post['title'] for post in content['posts']], ['test2'])
+        response = self.client.get(reverse('apps.users:home_feed'), {'cursor': content['next_cursor']})
+        content = json.loads(response.content)
+        self.assertEqual([post['title'] for post in content['posts']], ['test1'])
+        self.assertIsNone(content['next_cursor'])
+
+
+@override_settings(STREAMING_PAGES_ENABLED=True, STREAMING_PAGE_SIZE=2, STREAMING_CHUNK_SIZE=1)
+class StreamingPagesTests(TestCase):
+
+    def setUp(self):
+        self.user1 = User.objects.create_user('foo1', 'foo1@example.com', 'testpassword')
+        self.user2 = User.objects.create_user('foo2', 'foo2@example.com', 'testpassword')
+        Follow.objects.follow(self.user1, self.user2)
+        self.tweets = [
+            Post.objects.create(title='test{}'.format(i), content='test', user=self.user2) for i in range(3)
+        ]
+        for tweet in self.tweets:
+            fan_out_post(tweet)
+        Like.objects.like(self.user1, self.tweets[2].pk)
+        self.client.login(username='foo1', password='testpassword')
+
+    def get_page(self, url, data=None):
+        response = self.client.get(url, data)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode()
+        self.assertTrue(content.rstrip().endswith('</html>'))
+        return content
+
+    def assertTitles(self, content, titles):
+        positions = [content.find('タイトル：{}<'.format(title)) for title in titles]
+        self.assertNotIn(-1, positions)
+        self.assertEqual(positions, sorted(positions))
+
+    def test_home_streams_cards(self):
+        url = reverse('apps.users:home')
+        content = self.get_page(url)
+        self.assertTitles(content, ['test2', 'test1'])
+        self.assertNotIn('タイトル：test0<', content)
+        self.assertIn('fas fa-thumbs-up', content)
+        cursor = content.split('?cursor=')[1].split('"')[0]
+        content = self.get_page(url, {'cursor': cursor})
+        self.assertTitles(content, ['test0'])
+        self.assertNotIn('?cursor=', content)
+
+    def test_profile_streams_cards(self):
+        url = reverse('apps.users:profile', kwargs={'username': 'foo2'})
+        content = self.get_page(url)
+        self.assertIn('Following', content)
+        self.assertTitles(content, ['test2', 'test1'])
+        cursor = content.split('?cursor=')[1].split('"')[0]
+        content = self.get_page(url, {'cursor': cursor})
+        self.assertTitles(content, ['test0'])
+        self.assertNotIn('?cursor=', content)
+
+    def test_invalid_cursor(self):
+        for url in (reverse('apps.users:home'), reverse('apps.users:profile', kwargs={'username': 'foo2'})):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url, {'cursor': 'invalid'}).status_code, 400)
+
+
+class PostNotifierTests(SimpleTestCase):
+
+    def test_wait_times_out(self):
+        notifier = PostNotifier()
+        self.assertEqual(notifier.wait(notifier.version, 0.01), 0)
+
+    def test_notify_wakes_waiters(self):
+        notifier = PostNotifier()
+        timer = threading.Timer(0.01, notifier.notify)
+        timer.start()
+        start = time.monotonic()
+        self.assertEqual(notifier.wait(0, 5), 1)
+        self.assertLess(time.monotonic() - start, 5)
+        timer.join()
+
+    def test_missed_notification_returns_at_once(self):
+        notifier = PostNotifier()
+        notifier.notify()
+        self.assertEqual(notifier.wait(0, 5), 1)
 
 
 class TweetDetailTests(TestCase):
@@ -115,6 +279,27 @@ class LikeTests(TestCase):
         self.assertEquals(json.loads(post_reaponse.content)['liked'], True)
         self.assertEqual(Like.objects.filter(user=self.user).count(), 1)
 
+    def test_tweet_like_twice_keeps_count(self):
+        self.client.login(username='foo', password='testpassword')
+        self.client.post(self.url, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        post_reaponse = self.client.post(self.url, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEquals(json.loads(post_reaponse.content)['likes_count'], 1)
+        self.tweet.refresh_from_db()
+        self.assertEqual(self.tweet.like_count, 1)
+
+    def test_tweet_like_is_idempotent(self):
+        self.assertTrue(Like.objects.like(self.user, self.tweet.pk))
+        self.assertFalse(Like.objects.like(self.user, self.tweet.pk))
+        self.assertEqual(Like.objects.filter(user=self.user, post=self.tweet).count(), 1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Like.objects.create(user=self.user, post=self.tweet)
+
+    def test_tweet_like_missing_post(self):
+        self.client.login(username='foo', password='testpassword')
+        post_reaponse = self.client.post(reverse('apps.users:like', kwargs={'pk': self.tweet.pk + 1}))
+        self.assertEquals(post_reaponse.status_code, 404)
+        self.assertFalse(Like.objects.exists())
+
 
 class UnikeTests(TestCase):
     
@@ -133,6 +318,98 @@ class UnikeTests(TestCase):
         self.assertEquals(json.loads(post_reaponse.content)['liked'], False)
         self.assertEqual(Like.objects.filter(user=self.user).count(), 0)
 
+    def test_tweet_unlike_twice_keeps_count(self):
+        self.client.login(username='foo', password='testpassword')
+        self.client.post(self.url1, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.client.post(self.url2, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        post_reaponse = self.client.post(self.url2, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEquals(json.loads(post_reaponse.content)['likes_count'], 0)
+
+    def test_tweet_unlike_drifted_count(self):
+        Like.objects.like(self.user, self.tweet.pk)
+        Post.objects.filter(pk=self.tweet.pk).update(like_count=0)
+        self.client.login(username='foo', password='testpassword')
+        post_reaponse = self.client.post(self.url2, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEquals(post_reaponse.status_code, 200)
+        self.assertEquals(json.loads(post_reaponse.content)['likes_count'], 0)
+        self.assertFalse(Like.objects.exists())
+
+
+@override_settings(LIKE_BUFFER_ENABLED=True, LIKE_BUFFER_FLUSH_INTERVAL=0)
+class LikeBufferTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('foo', 'foo@example.com', 'testpassword')
+        self.other = User.objects.create_user('bar', 'bar@example.com', 'testpassword')
+        self.tweet = Post.objects.create(title='test', content='test', user=self.user)
+        self.like_url = reverse('apps.users:like', kwargs={'pk': self.tweet.pk})
+        self.unlike_url = reverse('apps.users:unlike', kwargs={'pk': self.tweet.pk})
+        self.client.login(username='foo', password='testpassword')
+
+    def tearDown(self):
+        like_buffer.flush()
+
+    def test_toggles_are_buffered_with_optimistic_count(self):
+        response = self.client.post(self.like_url)
+        self.assertEqual(json.loads(response.content)['likes_count'], 1)
+        self.assertFalse(Like.objects.exists())
+        response = self.client.post(self.like_url)
+        self.assertEqual(json.loads(response.content)['likes_count'], 1)
+        self.assertEqual(like_buffer.flush(), 1)
+        self.tweet.refresh_from_db()
+        self.assertEqual(self.tweet.like_count, 1)
+        self.assertTrue(Like.objects.filter(user=self.user, post=self.tweet).exists())
+
+    def test_last_toggle_wins(self):
+        Like.objects.like(self.other, self.tweet.pk)
+        self.client.post(self.like_url)
+        self.client.post(self.unlike_url)
+        response = self.client.post(self.like_url)
+        self.assertEqual(json.loads(response.content)['likes_count'], 2)
+        self.client.force_login(self.other)
+        response = self.client.post(self.unlike_url)
+        self.assertEqual(json.loads(response.content)['likes_count'], 1)
+        with self.assertNumQueries(6):
+            self.assertEqual(like_buffer.flush(), 2)
+        self.assertEqual(list(Like.objects.values_list('user', flat=True)), [self.user.pk])
+        self.tweet.refresh_from_db()
+        self.assertEqual(self.tweet.like_count, 1)
+
+    def test_flush_counts_only_rows_it_changed(self):
+        self.client.post(self.like_url)
+        Like.objects.like(self.user, self.tweet.pk)
+        self.client.force_login(self.other)
+        self.client.post(self.unlike_url)
+        Post.objects.filter(pk=self.tweet.pk).update(like_count=5)
+        with self.assertNumQueries(4):
+            self.assertEqual(like_buffer.flush(), 2)
+        self.tweet.refresh_from_db()
+        self.assertEqual(self.tweet.like_count, 5)
+        call_command('reconcile_like_counts', stdout=StringIO())
+        self.tweet.refresh_from_db()
+        self.assertEqual(self.tweet.like_count, 1)
+
+    def test_unlike_on_drifted_count_stops_at_zero(self):
+        Like.objects.like(self.other, self.tweet.pk)
+        Post.objects.filter(pk=self.tweet.pk).update(like_count=0)
+        self.client.force_login(self.other)
+        self.client.post(self.unlike_url)
+        self.assertEqual(like_buffer.flush(), 1)
+        self.tweet.refresh_from_db()
+        self.assertEqual(self.tweet.like_count, 0)
+        self.assertFalse(Like.objects.exists())
+        self.assertEqual(like_buffer.flush(), 0)
+
+    def test_deleted_post_is_skipped(self):
+        self.client.post(self.like_url)
+        self.tweet.delete()
+        like_buffer.flush()
+        self.assertFalse(Like.objects.exists())
+
+    def test_missing_post(self):
+        response = self.client.post(reverse('apps.users:like', kwargs={'pk': self.tweet.pk + 1}))
+        self.assertEqual(response.status_code, 404)
+
 
 class TweetLikeListTests(TestCase):
     
@@ -153,3 +430,387 @@ class TweetLikeListTests(TestCase):
             ['<Post: test>'], 
             ordered = True
         )
+
+    @override_settings(TIMELINE_PAGE_SIZE=2)
+    def test_tweet_like_view_orders_by_like_time(self):
+        other = User.objects.create_user('bar', 'bar@example.com', 'testpassword')
+        old_post = Post.objects.create(title='old', content='old', user=other)
+        new_post = Post.objects.create(title='new', content='new', user=other)
+        base = timezone.now()
+        Like.objects.filter(user=self.user, post=self.tweet).update(created_at=base - timedelta(minutes=2))
+        Like.objects.create(user=self.user, post=new_post)
+        Like.objects.create(user=self.user, post=old_post)
+        Like.objects.filter(post=new_post).update(created_at=base - timedelta(minutes=1))
+        Like.objects.filter(post=old_post).update(created_at=base)
+
+        response = self.client.get(self.url2)
+        self.assertEqual(response.context['liked_post_list'], [old_post, new_post])
+        self.assertTrue(all(post.liked for post in response.context['liked_post_list']))
+        response = self.client.get(self.url2, {'cursor': response.context['next_cursor']})
+        self.assertEqual(response.context['liked_post_list'], [self.tweet])
+        self.assertIsNone(response.context['next_cursor'])
+
+    def test_tweet_like_view_invalid_cursor(self):
+        response = self.client.get(self.url2, {'cursor': 'invalid'})
+        self.assertEqual(response.status_code, 400)
+
+
+class LikedPostPksTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('foo', 'foo@example.com', 'testpassword')
+        self.tweets = [
+            Post.objects.create(title='test{}'.format(i), content='test', user=self.user) for i in range(4)
+        ]
+        for tweet in self.tweets:
+            fan_out_post(tweet)
+        other = Post.objects.create(title='other', content='other', user=self.user)
+        Like.objects.like(self.user, self.tweets[0].pk)
+        Like.objects.like(self.user, other.pk)
+        self.client.login(username='foo', password='testpassword')
+
+    def test_liked_post_pks_scoped_to_posts(self):
+        with self.assertNumQueries(1):
+            liked_post_pks = Like.objects.liked_post_pks(self.user, [tweet.pk for tweet in self.tweets])
+        self.assertEqual(liked_post_pks, {self.tweets[0].pk})
+
+    def test_liked_post_pks_empty_page(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(Like.objects.liked_post_pks(self.user, []), set())
+
+    def test_home_view_query_count(self):
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('apps.users:home'))
+        self.assertEqual([post.liked for post in response.context['post_list']], [False, False, False, True])
+
+
+class FeedQueryBudgetTests(TestCase):
+
+    def setUp(self):
+        self.user1 = User.objects.create_user('foo1', 'foo1@example.com', 'testpassword')
+        self.user2 = User.objects.create_user('foo2', 'foo2@example.com', 'testpassword')
+        Follow.objects.follow(self.user1, self.user2)
+        self.client.login(username='foo1', password='testpassword')
+
+    def create_posts(self, count):
+        for i in range(count):
+            tweet = Post.objects.create(title='test{}'.format(i), content='test', user=self.user2)
+            fan_out_post(tweet)
+            Like.objects.like(self.user1, tweet.pk)
+
+    def assertQueryBudget(self, url, budget):
+        # Budgets are for a warm authenticated-user cache.
+        self.client.get(url)
+        for count in (1, 5):
+            self.create_posts(count)
+            with self.assertNumQueries(budget):
+                response = self.client.get(url)
+            self.assertEquals(response.status_code, 200)
+
+    def test_home_view_query_budget(self):
+        self.assertQueryBudget(reverse('apps.users:home'), 4)
+
+    def test_home_feed_view_query_budget(self):
+        self.assertQueryBudget(reverse('apps.users:home_feed'), 4)
+
+    def test_favorite_view_query_budget(self):
+        self.assertQueryBudget(reverse('apps.users:favorite'), 2)
+
+    def test_detail_view_query_budget(self):
+        self.create_posts(1)
+        url = reverse('apps.users:tweet_detail', kwargs={'pk': Post.objects.first().pk})
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertContains(response, 'fas fa-thumbs-up')
+
+
+class TweetCardCacheTests(TestCase):
+
+    def setUp(self):
+        card_cache().clear()
+        self.user1 = User.objects.create_user('foo1', 'foo1@example.com', 'testpassword')
+        self.user2 = User.objects.create_user('foo2', 'foo2@example.com', 'testpassword')
+        Follow.objects.follow(self.user2, self.user1)
+        self.tweet = Post.objects.create(title='test', content='test', user=self.user1)
+        fan_out_post(self.tweet)
+        Like.objects.like(self.user1, self.tweet.pk)
+        self.url = reverse('apps.users:home')
+
+    def test_card_cached_and_liked_state_per_viewer(self):
+        self.client.login(username='foo1', password='testpassword')
+        response = self.client.get(self.url)
+        self.assertContains(response, 'fas fa-thumbs-up')
+        self.assertIsNotNone(card_cache().get(card_cache_key(self.tweet, 'author')))
+        self.assertEqual(card_stats(), (0, 1))
+        self.client.login(username='foo2', password='testpassword')
+        response = self.client.get(self.url)
+        self.assertContains(response, self.tweet.title)
+        self.assertContains(response, 'far fa-thumbs-up')
+        self.assertEqual(card_stats(), (1, 1))
+
+    def test_card_invalidated_on_delete(self):
+        self.client.login(username='foo1', password='testpassword')
+        self.client.get(self.url)
+        self.tweet.delete()
+        self.assertIsNone(card_cache().get(card_cache_key(self.tweet, 'author')))
+
+    def test_card_shows_renamed_author(self):
+        self.client.login(username='foo1', password='testpassword')
+        self.client.get(self.url)
+        self.user1.username = 'renamed'
+        self.user1.save()
+        response = self.client.get(self.url)
+        self.assertContains(response, reverse('apps.users:profile', kwargs={'username': 'renamed'}))
+        self.assertNotContains(response, reverse('apps.users:profile', kwargs={'username': 'foo1'}))
+
+    def test_tweet_card_stats_command(self):
+        self.client.login(username='foo1', password='testpassword')
+        self.client.get(self.url)
+        out = StringIO()
+        call_command('tweet_card_stats', '--reset', stdout=out)
+        self.assertIn('hits=0 misses=1', out.getvalue())
+        self.assertEqual(card_stats(), (0, 0))
+
+
+class RebuildTimelinesTests(TestCase):
+
+    def setUp(self):
+        self.user1 = User.objects.create_user('foo1', 'foo1@example.com', 'testpassword')
+        self.user2 = User.objects.create_user('foo2', 'foo2@example.com', 'testpassword')
+        Follow.objects.follow(self.user1, self.user2)
+        self.tweet = Post.objects.create(title='test', content='test', user=self.user2)
+
+    def test_rebuild_timelines(self):
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertTrue(TimelineEntry.objects.filter(owner=self.user1, post=self.tweet).exists())
+        self.assertTrue(TimelineEntry.objects.filter(owner=self.user2, post=self.tweet).exists())
+
+
+class ReconcileLikeCountsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('foo', 'foo@example.com', 'testpassword')
+        self.tweet1 = Post.objects.create(title='test1', content='test1', user=self.user)
+        self.tweet2 = Post.objects.create(title='test2', content='test2', user=self.user)
+        Like.objects.create(user=self.user, post=self.tweet1)
+        Post.objects.filter(pk=self.tweet2.pk).update(like_count=5)
+
+    def test_reconcile_like_counts(self):
+        out = StringIO()
+        call_command('reconcile_like_counts', stdout=out)
+        self.assertIn('2 posts', out.getvalue())
+        self.tweet1.refresh_from_db()
+        self.tweet2.refresh_from_db()
+        self.assertEqual(self.tweet1.like_count, 1)
+        self.assertEqual(self.tweet2.like_count, 0)
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('foo', 'foo@example.com', 'testpassword')
+        self.client.login(username='foo', password='testpassword')
+        self.url = reverse('apps.users:search')
+        self.tokyo = Post.objects.create(title='東京タワー', content='夜景がきれい', user=self.user)
+        self.osaka = Post.objects.create(title='大阪', content='東京タワーより通天閣', user=self.user)
+        self.other = Post.objects.create(title='Django', content='full-text search', user=self.user)
+
+    def test_tokenize_japanese_as_bigrams(self):
+        self.assertEqual(tokenize('東京タワー Django!'), ['東京', '京タ', 'タワ', 'ワー', 'django'])
+        self.assertEqual(tokenize('ＡＢＣ'), ['abc'])
+
+    def test_search_single_japanese_character(self):
+        pet = Post.objects.create(title='猫が好き', content='今日は可愛い犬と散歩', user=self.user)
+        backend = get_search_backend()
+        for query in ('猫', '犬', '歩', '塔 ', '猫 散歩'):
+            with self.subTest(query=query):
+                expected = [] if query.strip() == '塔' else [pet.pk]
+                self.assertEqual(backend.search(query)[0], expected)
+
+    def test_search_ranks_title_matches_first(self):
+        response = self.client.get(self.url, {'q': '東京タワー'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['post_list']), [self.tokyo, self.osaka])
+
+    def test_search_terms_are_anded(self):
+        response = self.client.get(self.url, {'q': '東京 夜景'})
+        self.assertEqual(list(response.context['post_list']), [self.tokyo])
+
+    def test_search_follows_edits_and_deletes(self):
+        self.other.content = '東京で開発'
+        self.other.save()
+        self.tokyo.delete()
+        post_pks, _ = get_search_backend().search('東京')
+        self.assertCountEqual(post_pks, [self.osaka.pk, self.other.pk])
+
+    def test_search_keyset_pagination(self):
+        for i in range(3):
+            Post.objects.create(title='京都', content='紅葉 {}'.format(i), user=self.user)
+        backend = get_search_backend()
+        first, cursor = backend.search('京都', limit=2)
+        second, next_cursor = backend.search('京都', cursor=cursor, limit=2)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertIsNone(next_cursor)
+        self.assertFalse(set(first) & set(second))
+
+    def test_search_invalid_cursor(self):
+        response = self.client.get(self.url, {'q': '東京', 'cursor': '!!'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_rebuild_search_index(self):
+        get_search_backend().clear()
+        out = StringIO()
+        call_command('rebuild_search_index', '--batch-size', '2', stdout=out)
+        self.assertIn('Indexed 3 posts', out.getvalue())
+        post_pks, _ = get_search_backend().search('search')
+        self.assertEqual(post_pks, [self.other.pk])
+
+
+@override_settings(TRENDING_HALF_LIFE=3600, TRENDING_CANDIDATES=2)
+class TrendingTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.users = [
+            User.objects.create_user('foo{}'.format(i), 'foo{}@example.com'.format(i), 'testpassword')
+            for i in range(3)
+        ]
+        self.client.login(username='foo0', password='testpassword')
+        self.tweets = [Post.objects.create(title='test', content='test', user=self.users[0]) for _ in range(3)]
+        self.now = timezone.now()
+
+    def like(self, user, post, hours_ago):
+        Like.objects.create(user=user, post=post)
+        Like.objects.filter(user=user, post=post).update(created_at=self.now - timedelta(hours=hours_ago))
+
+    def test_scores_decay_with_like_age(self):
+        self.like(self.users[0], self.tweets[0], 0)
+        self.like(self.users[0], self.tweets[1], 1)
+        self.like(self.users[1], self.tweets[1], 1)
+        self.assertEqual(update_trending(self.now), 3)
+        scores = dict(TrendingScore.objects.values_list('post', 'score'))
+        self.assertAlmostEqual(scores[self.tweets[0].pk], 1.0)
+        self.assertAlmostEqual(scores[self.tweets[1].pk], 1.0)
+
+    def test_incremental_update(self):
+        self.like(self.users[0], self.tweets[0], 0)
+        update_trending(self.now)
+        self.like(self.users[1], self.tweets[0], 0)
+        self.assertEqual(update_trending(self.now + timedelta(hours=1)), 1)
+        score = TrendingScore.objects.get(post=self.tweets[0]).score
+        self.assertAlmostEqual(score, 0.5 + 0.5)
+        self.assertEqual(update_trending(self.now + timedelta(hours=2)), 0)
+
+    def test_like_toggles_count_once(self):
+        for cycle in range(5):
+            Like.objects.like(self.users[1], self.tweets[0].pk)
+            update_trending(self.now + timedelta(minutes=cycle))
+            Like.objects.unlike(self.users[1], self.tweets[0].pk)
+            update_trending(self.now + timedelta(minutes=cycle))
+        self.assertFalse(TrendingScore.objects.exists())
+        for _ in range(5):
+            Like.objects.like(self.users[1], self.tweets[0].pk)
+            Like.objects.unlike(self.users[1], self.tweets[0].pk)
+        Like.objects.like(self.users[1], self.tweets[0].pk)
+        update_trending()
+        self.assertAlmostEqual(TrendingScore.objects.get(post=self.tweets[0]).score, 1.0, places=3)
+
+    def test_only_top_candidates_are_kept(self):
+        for i, tweet in enumerate(self.tweets):
+            for user in self.users[:i + 1]:
+                self.like(user, tweet, 0)
+        update_trending(self.now)
+        self.assertCountEqual(
+            TrendingScore.objects.values_list('post', flat=True), [self.tweets[1].pk, self.tweets[2].pk]
+        )
+
+    def test_trending_view(self):
+        self.like(self.users[0], self.tweets[0], 2)
+        self.like(self.users[0], self.tweets[1], 0)
+        update_trending(self.now)
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('apps.users:trending'))
+        self.assertEqual(list(response.context['post_list']), [self.tweets[1], self.tweets[0]])
+        with self.assertNumQueries(2):
+            self.client.get(reverse('apps.users:trending'))
+
+
+class SocialExportImportTests(TestCase):
+
+    def setUp(self):
+        self.user1 = User.objects.create_user('foo1', 'foo1@example.com', 'testpassword')
+        self.user2 = User.objects.create_user('foo2', 'foo2@example.com', 'testpassword')
+        Follow.objects.follow(self.user1, self.user2)
+        self.tweet1 = Post.objects.create(title='東京', content='test1', user=self.user2)
+        self.tweet2 = Post.objects.create(title='test2', content='test2', user=self.user1)
+        Like.objects.like(self.user1, self.tweet1.pk)
+        Like.objects.like(self.user2, self.tweet1.pk)
+
+    def export(self):
+        out = StringIO()
+        call_command('export_social', batch_size=1, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def import_file(self, data, **options):
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False, encoding='utf-8') as f:
+            f.write(data)
+        self.addCleanup(os.remove, f.name)
+        call_command('import_social', f.name, stdout=StringIO(), **options)
+
+    def test_export_format(self):
+        records = [json.loads(line) for line in self.export().splitlines()]
+        self.assertEqual([r['type'] for r in records], ['user', 'user', 'follow', 'post', 'post', 'like', 'like'])
+        self.assertEqual(records[2]['follower'], 'foo1')
+        self.assertEqual(records[3]['title'], '東京')
+
+    def test_round_trip(self):
+        data = self.export()
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+        User.objects.filter(pk=self.user2.pk).delete()
+        Post.objects.create(title='existing', content='existing', user=self.user1)
+        self.import_file(data, batch_size=1)
+        user2 = User.objects.get(username='foo2')
+        self.assertTrue(user2.check_password('testpassword'))
+        self.assertTrue(Follow.objects.filter(follower=self.user1, followee=user2).exists())
+        tweet = Post.objects.get(title='東京')
+        self.assertEqual(tweet.user, user2)
+        self.assertGreater(tweet.pk, self.tweet2.pk)
+        self.assertEqual(tweet.like_count, 2)
+        self.assertEqual(tweet.created_at, self.tweet1.created_at)
+        user2.refresh_from_db()
+        self.assertEqual(user2.followers_count, 1)
+        self.assertEqual(get_search_backend().search('東京')[0], [tweet.pk])
+
+    def test_resume_from_checkpoint(self):
+        data = self.export()
+        Post.objects.all().delete()
+        checkpoint = os.path.join(tempfile.mkdtemp(), 'checkpoint.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(checkpoint))
+        lines = data.splitlines(keepends=True)
+        # Stop after the first post; the second run replays from the checkpoint.
+        self.import_file(''.join(lines[:4]), batch_size=2, checkpoint=checkpoint)
+        self.import_file(data, batch_size=2, checkpoint=checkpoint)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Like.objects.count(), 2)
+        with open(checkpoint) as f:
+            self.assertEqual(json.load(f)['line'], 7)
+
+    def test_posts_created_during_import_keep_clear_of_imported_ids(self):
+        data = self.export()
+        load_posts = ImportSocialCommand.load_posts
+
+        def load_posts_then_post_live(command, batch):
+            load_posts(command, batch)
+            Post.objects.create(title='live', content='live', user=self.user1)
+
+        with mock.patch.object(ImportSocialCommand, 'load_posts', load_posts_then_post_live):
+            self.import_file(data, batch_size=1)
+        imported = Post.objects.filter(pk__gt=self.tweet2.pk).exclude(title='live')
+        self.assertEqual(sorted(imported.values_list('title', flat=True)), ['test2', '東京'])
+        self.assertGreater(
+            min(Post.objects.filter(title='live').values_list('pk', flat=True)),
+            max(imported.values_list('pk', flat=True)),
+        )
+        self.assertEqual(imported.get(title='東京').like_count, 2)
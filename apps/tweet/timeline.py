@@ -0,0 +1,124 @@
+from django.conf import settings
+
+from apps.users.models import Follow
+
+from .models import Post, TimelineEntry
+from .pagination import encode_cursor, keyset_filter, keyset_newer_filter
+
+
+def is_celebrity(user):
+    return user.followers_count > settings.TIMELINE_FANOUT_THRESHOLD
+
+
+def celebrity_followee_ids(user):
+    return list(
+        Follow.objects.filter(follower=user, followee__followers_count__gt=settings.TIMELINE_FANOUT_THRESHOLD)
+        .values_list('followee', flat=True)
+    )
+
+
+def _write_entries(owner_ids, posts):
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(owner_id=owner_id, post_id=post.pk, created_at=post.created_at)
+            for owner_id in owner_ids
+            for post in posts
+        ],
+        batch_size=settings.TIMELINE_FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out_post(post):
+    """
+    Push ``post`` into its author's timeline and, unless the author is
+    above ``TIMELINE_FANOUT_THRESHOLD``, into every follower's timeline.
+    """
+    _write_entries([post.user_id], [post])
+    if is_celebrity(post.user):
+        return
+    batch = []
+    follower_ids = Follow.objects.filter(followee=post.user).values_list('follower', flat=True)
+    for follower_id in follower_ids.iterator(chunk_size=settings.TIMELINE_FANOUT_BATCH_SIZE):
+        batch.append(follower_id)
+        if len(batch) == settings.TIMELINE_FANOUT_BATCH_SIZE:
+            _write_entries(batch, [post])
+            batch = []
+    if batch:
+        _write_entries(batch, [post])
+
+
+def backfill_timeline(owner, author):
+    if author != owner and is_celebrity(author):
+        return
+    posts = Post.objects.filter(user=author).only('pk', 'created_at')[:settings.TIMELINE_BACKFILL_SIZE]
+    _write_entries([owner.pk], posts)
+
+
+def remove_from_timeline(owner, author):
+    TimelineEntry.objects.filter(owner=owner, post__user=author).delete()
+
+
+def home_timeline_keys(viewer, cursor=None, page_size=None):
+    """
+    Return the ``(created_at, post_pk)`` keys of one page of ``viewer``'s
+    home timeline and the cursor for the next one. Fanned-out entries are
+    merged with the recent posts of any followed authors that skip fan-out.
+    """
+    page_size = page_size or settings.TIMELINE_PAGE_SIZE
+    entries = TimelineEntry.objects.filter(owner=viewer)
+    if cursor:
+        entries = keyset_filter(entries, cursor, 'created_at', 'post_id')
+    keys = list(
+        entries.order_by('-created_at', '-post_id').values_list('created_at', 'post_id')[:page_size + 1]
+    )
+    celebrity_ids = celebrity_followee_ids(viewer)
+    # One query per author walks the (user, created_at, id) index in order;
+    # a single user IN (...) query would have to sort all their posts.
+    for author_id in celebrity_ids:
+        posts = Post.objects.filter(user=author_id)
+        if cursor:
+            posts = keyset_filter(posts, cursor)
+        keys += list(posts.order_by('-created_at', '-id').values_list('created_at', 'id')[:page_size + 1])
+    if celebrity_ids:
+        keys = sorted(set(keys), reverse=True)[:page_size + 1]
+    next_cursor = None
+    if len(keys) > page_size:
+        keys = keys[:page_size]
+        next_cursor = encode_cursor(*keys[-1])
+    return keys, next_cursor
+
+
+def home_timeline_since(viewer, since, limit=None):
+    """
+    Return the keys of up to ``limit`` posts in ``viewer``'s home timeline
+    newer than the cursor ``since``, oldest first, so a client that polls
+    again from the last key misses none.
+    """
+    limit = limit or settings.TIMELINE_PAGE_SIZE
+    entries = keyset_newer_filter(TimelineEntry.objects.filter(owner=viewer), since, 'created_at', 'post_id')
+    keys = list(entries.order_by('created_at', 'post_id').values_list('created_at', 'post_id')[:limit])
+    for author_id in celebrity_followee_ids(viewer):
+        posts = keyset_newer_filter(Post.objects.filter(user=author_id), since)
+        keys += list(posts.order_by('created_at', 'id').values_list('created_at', 'id')[:limit])
+    return sorted(set(keys))[:limit]
+
+
+def home_timeline(viewer, cursor=None, page_size=None):
+    """Return one page of ``viewer``'s home timeline as feed posts, and the next cursor."""
+    keys, next_cursor = home_timeline_keys(viewer, cursor, page_size)
+    posts = Post.objects.for_feed(viewer).in_bulk([pk for _, pk in keys])
+    return [posts[pk] for _, pk in keys if pk in posts], next_cursor
+
+
+def iter_timeline_posts(viewer, keys, chunk_size):
+    """
+    Yield the feed posts for timeline ``keys`` in order, loading
+    ``chunk_size`` of them per query.
+    """
+    for start in range(0, len(keys), chunk_size):
+        chunk = [pk for _, pk in keys[start:start + chunk_size]]
+        posts = Post.objects.for_feed(viewer).in_bulk(chunk)
+        for pk in chunk:
+            if pk in posts:
+                yield posts[pk]
@@ -0,0 +1,112 @@
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+from .models import Like, Post, TrendingScore, TrendingState, TrendingVote
+
+TRENDING_CACHE_KEY = 'trending:post_pks'
+
+
+def decay_factor(seconds):
+    """Weight left on a like ``seconds`` old; it halves every ``TRENDING_HALF_LIFE`` seconds."""
+    return 0.5 ** (seconds / settings.TRENDING_HALF_LIFE)
+
+
+def update_trending(now=None, batch_size=1000):
+    """
+    Bring trending scores up to ``now``: decay every stored score by the
+    time elapsed since the last run in one UPDATE, take back the weight of
+    likes removed since they were counted, add the likes created since the
+    watermark, then keep only the top ``TRENDING_CANDIDATES``. Counted
+    likes are kept as ``TrendingVote`` rows while their post is a candidate
+    and their weight is above ``TRENDING_MIN_SCORE``, so toggling a like
+    never adds up. Returns the number of new likes read.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        state, _ = TrendingState.objects.select_for_update().get_or_create(pk=1)
+        if state.computed_at is not None:
+            elapsed = max((now - state.computed_at).total_seconds(), 0)
+            TrendingScore.objects.update(score=F('score') * decay_factor(elapsed))
+
+        gains = defaultdict(float)
+        unliked = TrendingVote.objects.annotate(
+            live=Exists(Like.objects.filter(pk=OuterRef('like_id')))
+        ).filter(live=False).values_list('like_id', 'post', 'created_at')
+        gone = []
+        for like_id, post_id, created_at in unliked.iterator(chunk_size=batch_size):
+            gains[post_id] -= decay_factor(max((now - created_at).total_seconds(), 0))
+            gone.append(like_id)
+        for i in range(0, len(gone), batch_size):
+            TrendingVote.objects.filter(like_id__in=gone[i:i + batch_size]).delete()
+
+        read = 0
+        votes = []
+        likes = Like.objects.filter(pk__gt=state.last_like_id).order_by('pk').values_list('pk', 'post', 'created_at')
+        for like_id, post_id, created_at in likes.iterator(chunk_size=batch_size):
+            gains[post_id] += decay_factor(max((now - created_at).total_seconds(), 0))
+            votes.append(TrendingVote(like_id=like_id, post_id=post_id, created_at=created_at))
+            if len(votes) >= batch_size:
+                TrendingVote.objects.bulk_create(votes)
+                votes = []
+            state.last_like_id = like_id
+            read += 1
+        TrendingVote.objects.bulk_create(votes)
+
+        if gains:
+            scores = TrendingScore.objects.in_bulk(list(gains))
+            for post_id, score in scores.items():
+                score.score += gains[post_id]
+            TrendingScore.objects.bulk_update(scores.values(), ['score'], batch_size=batch_size)
+            # Skip posts deleted since they were liked.
+            fresh = Post.objects.filter(
+                pk__in=[pk for pk, gain in gains.items() if pk not in scores and gain > 0]
+            ).values_list('pk', flat=True)
+            TrendingScore.objects.bulk_create(
+                [TrendingScore(post_id=pk, score=gains[pk]) for pk in fresh], batch_size=batch_size
+            )
+
+        TrendingScore.objects.filter(score__lt=settings.TRENDING_MIN_SCORE).delete()
+        cutoff = TrendingScore.objects.order_by('-score', '-post_id').values_list('score', 'post')[
+            settings.TRENDING_CANDIDATES:settings.TRENDING_CANDIDATES + 1
+        ]
+        for score, post_id in cutoff:
+            TrendingScore.objects.filter(score__lte=score).exclude(score=score, post__gt=post_id).delete()
+
+        # Votes too old to matter, or for posts that dropped out, are not
+        # taken back on unlike.
+        horizon = settings.TRENDING_HALF_LIFE * math.log2(1 / settings.TRENDING_MIN_SCORE)
+        TrendingVote.objects.filter(created_at__lt=now - timedelta(seconds=horizon)).delete()
+        TrendingVote.objects.exclude(post__in=TrendingScore.objects.values('post')).delete()
+
+        state.computed_at = now
+        state.save()
+    cache.delete(TRENDING_CACHE_KEY)
+    return read
+
+
+def trending_posts(viewer, limit=None):
+    """
+    The highest scoring posts ready to render as tweet cards. The ranking
+    is cached for ``TRENDING_CACHE_TIMEOUT`` seconds, so a request costs one
+    post lookup. The ``cache.delete`` in ``update_trending`` only clears the
+    cache of the process that ran it; with the default per-process locmem
+    cache, web workers keep serving the old ranking until their entry
+    expires, up to ``TRENDING_CACHE_TIMEOUT`` seconds after a run.
+    """
+    limit = limit or settings.TIMELINE_PAGE_SIZE
+    post_pks = cache.get(TRENDING_CACHE_KEY)
+    if post_pks is None:
+        post_pks = list(
+            TrendingScore.objects.order_by('-score', '-post_id').values_list('post', flat=True)[:settings.TRENDING_CANDIDATES]
+        )
+        cache.set(TRENDING_CACHE_KEY, post_pks, settings.TRENDING_CACHE_TIMEOUT)
+    post_pks = post_pks[:limit]
+    posts = Post.objects.for_feed(viewer).in_bulk(post_pks)
+    return [posts[pk] for pk in post_pks if pk in posts]
@@ -5,7 +5,10 @@ from . import views
 
 urlpatterns = [
     path('home/', views.HomeView.as_view(), name='home'),
+    path('home/feed/', views.HomeFeedView.as_view(), name='home_feed'),
+    path('trending/', views.TrendingView.as_view(), name='trending'),
     path('favorite/', views.LikeTweetView.as_view(), name='favorite'),
+    path('search/', views.SearchView.as_view(), name='search'),
     path('tweet/', views.CreateTweetView.as_view(), name='tweet_create'),
     path('detail/<int:pk>/', views.DetailTweetView.as_view(), name='tweet_detail'),
     path('detail/<int:pk>/delete/', views.DeleteTweetView.as_view(), name='tweet_delete'),
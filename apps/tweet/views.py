@@ -1,36 +1,135 @@
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.http import JsonResponse
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.http import Http404, HttpResponseBadRequest, JsonResponse
 from django.shortcuts import get_object_or_404, render
 from django.urls import reverse
 from django.views.generic import CreateView, DeleteView, View
 
+from apps.jobs.queue import enqueue
+
 from .forms import PostCreateForm
+from .likebuffer import like_buffer
 from .models import Post, Like
+from .pagination import InvalidCursor, paginate_keyset
+from .search import get_search_backend
+from .streaming import stream_cards
+from .tasks import fan_out
+from .timeline import home_timeline, home_timeline_keys, iter_timeline_posts
+from .trending import trending_posts
 
 
 class HomeView(LoginRequiredMixin, View):
+    replica_reads = True
 
     def get(self, request, *args, **kwargs):
-        post_list = Post.objects.all()
-        liked_post_pk_list = Like.objects.filter(user=self.request.user).values_list('post', flat=True)
+        if settings.STREAMING_PAGES_ENABLED:
+            return self.stream(request)
+        try:
+            post_list, next_cursor = home_timeline(self.request.user, request.GET.get('cursor'))
+        except InvalidCursor:
+            return HttpResponseBadRequest()
         context = {
             'post_list': post_list,
-            'liked_post_pk_list': liked_post_pk_list,
+            'next_cursor': next_cursor,
         }
         return render(request, 'tweet/tweet_list.html', context)
 
+    def stream(self, request):
+        try:
+            keys, next_cursor = home_timeline_keys(
+                self.request.user, request.GET.get('cursor'), settings.STREAMING_PAGE_SIZE
+            )
+        except InvalidCursor:
+            return HttpResponseBadRequest()
+        posts = iter_timeline_posts(self.request.user, keys, settings.STREAMING_CHUNK_SIZE)
+        context = {
+            'post_list': [],
+            'next_cursor': next_cursor,
+        }
+        return stream_cards(request, 'tweet/tweet_list.html', context, posts, show_author=True)
+
+
+class HomeFeedView(LoginRequiredMixin, View):
+    replica_reads = True
+
+    def get(self, request, *args, **kwargs):
+        try:
+            post_list, next_cursor = home_timeline(self.request.user, request.GET.get('cursor'))
+        except InvalidCursor:
+            return HttpResponseBadRequest()
+        posts = [
+            {
+                'post_pk': post.pk,
+                'username': post.user.username,
+                'title': post.title,
+                'created_at': post.created_at.isoformat(),
+                'likes_count': post.like_count,
+                'liked': post.liked,
+            }
+            for post in post_list
+        ]
+        context = {
+            'posts': posts,
+            'next_cursor': next_cursor,
+        }
+        return JsonResponse(context)
+
+
+class TrendingView(LoginRequiredMixin, View):
+    replica_reads = True
+
+    def get(self, request, *args, **kwargs):
+        context = {
+            'post_list': trending_posts(self.request.user),
+        }
+        return render(request, 'tweet/trending.html', context)
+
 
 class LikeTweetView(LoginRequiredMixin, View):
+    """The viewer's liked posts, most recently liked first."""
+    replica_reads = True
 
     def get(self, request, *args, **kwargs):
-        liked_post_pk_list = Like.objects.filter(user=self.request.user).values_list('post')
-        liked_post_list = Post.objects.filter(id__in=liked_post_pk_list)
+        likes = Like.objects.filter(user=self.request.user).select_related('post__user')
+        try:
+            likes, next_cursor = paginate_keyset(likes, request.GET.get('cursor'))
+        except InvalidCursor:
+            return HttpResponseBadRequest()
+        liked_post_list = []
+        for like in likes:
+            like.post.liked = True
+            liked_post_list.append(like.post)
         context = {
             'liked_post_list': liked_post_list,
+            'next_cursor': next_cursor,
         }
         return render(request, 'tweet/tweet_like_list.html', context)
 
 
+class SearchView(LoginRequiredMixin, View):
+    replica_reads = True
+
+    def get(self, request, *args, **kwargs):
+        query = request.GET.get('q', '').strip()
+        post_list = []
+        next_cursor = None
+        if query:
+            try:
+                post_pks, next_cursor = get_search_backend().search(query, request.GET.get('cursor'))
+            except InvalidCursor:
+                return HttpResponseBadRequest()
+            posts = Post.objects.for_feed(self.request.user).in_bulk(post_pks)
+            post_list = [posts[pk] for pk in post_pks if pk in posts]
+        context = {
+            'query': query,
+            'post_list': post_list,
+            'next_cursor': next_cursor,
+        }
+        return render(request, 'tweet/search.html', context)
+
+
 class CreateTweetView(LoginRequiredMixin, CreateView):
     form_class = PostCreateForm
     template_name = 'tweet/tweet_create.html'
@@ -40,17 +139,17 @@ class CreateTweetView(LoginRequiredMixin, CreateView):
    
     def form_valid(self, form):
         form.instance.user = self.request.user
-        return super().form_valid(form)
+        response = super().form_valid(form)
+        enqueue(fan_out, post_pk=self.object.pk)
+        return response
 
 
 class DetailTweetView(LoginRequiredMixin, View):
    
     def get(self, request, *args, **kwargs):
-        post = get_object_or_404(Post, pk=self.kwargs["pk"])
-        liked_post_pk_list = Like.objects.filter(user=self.request.user).values_list('post', flat=True)
+        post = get_object_or_404(Post.objects.for_feed(self.request.user), pk=self.kwargs["pk"])
         context = {
             'post': post,
-            'liked_post_pk_list': liked_post_pk_list,
         }
         return render(request, 'tweet/tweet_detail.html', context)
 
@@ -68,33 +167,43 @@ class DeleteTweetView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         return (post.user == self.request.user) 
 
 
-class LikeTweet(LoginRequiredMixin, View):
+class LikeBase(LoginRequiredMixin, View):
+    liked = None
 
     def post(self, request, *args, **kwargs):
-        post = get_object_or_404(Post, pk=self.kwargs['pk'])
-        Like.objects.get_or_create(user=self.request.user, post=post)
-        likes_count = post.like_set.count()
-        liked = True
+        if settings.LIKE_BUFFER_ENABLED:
+            likes_count = self.buffer_like()
+        else:
+            likes_count = self.write_like()
         context = {
-            'post_pk': post.pk,
+            'post_pk': self.kwargs['pk'],
             'likes_count': likes_count,
-            'liked': liked,
+            'liked': self.liked,
         }
         return JsonResponse(context)
 
+    def write_like(self):
+        with transaction.atomic():
+            if self.liked:
+                Like.objects.like(self.request.user, self.kwargs['pk'])
+            else:
+                Like.objects.unlike(self.request.user, self.kwargs['pk'])
+            post = get_object_or_404(Post.objects.only('like_count'), pk=self.kwargs['pk'])
+        return post.like_count
 
-class UnlikeTweet(LoginRequiredMixin, View):
+    def buffer_like(self):
+        # A read only: the write is left to the buffer's next flush.
+        stored = Post.objects.filter(pk=self.kwargs['pk']).annotate(
+            liked=Exists(Like.objects.filter(user=self.request.user, post=OuterRef('pk')))
+        ).values_list('liked', 'like_count').first()
+        if stored is None:
+            raise Http404
+        return like_buffer.set_state(self.request.user.pk, self.kwargs['pk'], self.liked, *stored)
 
-    def post(self, request, *args, **kwargs):
-        post = get_object_or_404(Post, pk=self.kwargs['pk'])
-        like = Like.objects.filter(user=self.request.user, post=post)
-        if like:
-            like.delete()
-        likes_count = post.like_set.count()
-        liked = False
-        context = {
-            'post_pk': post.pk,
-            'likes_count': likes_count,
-            'liked': liked,
-        }
-        return JsonResponse(context)
+
+class LikeTweet(LikeBase):
+    liked = True
+
+
+class UnlikeTweet(LikeBase):
+    liked = False
@@ -1,8 +1,7 @@
 from django.contrib import admin
 
-from .models import User,Connection
+from .models import User,Follow
 
 
 admin.site.register(User)
-admin.site.register(Connection)
-
+admin.site.register(Follow)
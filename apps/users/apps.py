@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class RegistrationConfig(AppConfig):
     name = 'apps.users'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+
+from .cache import user_cache_key
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ``ModelBackend`` whose per-request ``get_user`` lookup is cached for
+    ``AUTH_USER_CACHE_TIMEOUT`` seconds. Saving or deleting a user drops
+    the entry (see ``apps.users.signals``); the timeout bounds how long
+    other processes keep an old copy.
+
+    Failed credentials raise ``PermissionDenied``, which stops
+    ``authenticate()`` before the stock ``ModelBackend`` listed after this
+    one (kept only so older sessions still resolve) hashes the password
+    a second time.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        user = super().authenticate(request, username=username, password=password, **kwargs)
+        if user is None and password is not None:
+            raise PermissionDenied
+        return user
+
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user
@@ -0,0 +1,21 @@
+from django.core.cache import cache
+
+
+def user_cache_key(user_pk):
+    return 'auth_user:{}'.format(user_pk)
+
+
+def profile_summary_key(user_pk):
+    return 'profile_summary:{}'.format(user_pk)
+
+
+def profile_pk_key(username):
+    return 'profile_pk:{}'.format(username)
+
+
+def forget_users(user_pks):
+    cache.delete_many([user_cache_key(pk) for pk in user_pks])
+
+
+def forget_profile_summaries(user_pks):
+    cache.delete_many([profile_summary_key(pk) for pk in user_pks])
@@ -0,0 +1,39 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Follow, User
+
+
+def reconcile_follow_counts(batch_size=1000):
+    """
+    Rewrite ``followers_count``/``following_count`` wherever they have
+    drifted from the follow graph, walking users in primary key batches.
+    Returns the number of users corrected.
+    """
+    followers = Follow.objects.filter(followee=OuterRef('pk')).order_by().values('followee').annotate(
+        count=Count('pk')
+    ).values('count')
+    following = Follow.objects.filter(follower=OuterRef('pk')).order_by().values('follower').annotate(
+        count=Count('pk')
+    ).values('count')
+    fixed = 0
+    last_pk = 0
+    while True:
+        pks = list(
+            User.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            return fixed
+        last_pk = pks[-1]
+        drifted = [
+            User(pk=pk, followers_count=followers_count, following_count=following_count)
+            for pk, followers_count, following_count in User.objects.filter(pk__in=pks)
+            .annotate(
+                actual_followers=Coalesce(Subquery(followers, output_field=IntegerField()), 0),
+                actual_following=Coalesce(Subquery(following, output_field=IntegerField()), 0),
+            )
+            .filter(~Q(followers_count=F('actual_followers')) | ~Q(following_count=F('actual_following')))
+            .values_list('pk', 'actual_followers', 'actual_following')
+        ]
+        User.objects.bulk_update(drifted, ['followers_count', 'following_count'])
+        fixed += len(drifted)
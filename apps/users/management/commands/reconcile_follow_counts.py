@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.users.counters import reconcile_follow_counts
+
+
+class Command(BaseCommand):
+    help = 'Recompute User.followers_count and User.following_count from the follow graph.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        fixed = reconcile_follow_counts(batch_size=options['batch_size'])
+        self.stdout.write('Reconciled follow counts for {} users.'.format(fixed))
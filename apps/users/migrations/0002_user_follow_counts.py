@@ -0,0 +1,41 @@
+# Generated by Django 2.2.28 on 2026-10-18 15:51
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_follow_counts(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    FolloweeThrough = apps.get_model('users', 'Connection').followee.through
+    followers = FolloweeThrough.objects.filter(user=OuterRef('pk')).order_by().values('user').annotate(
+        count=Count('pk')
+    ).values('count')
+    following = FolloweeThrough.objects.filter(connection__user=OuterRef('pk')).order_by().values(
+        'connection__user'
+    ).annotate(count=Count('pk')).values('count')
+    User.objects.update(
+        followers_count=Coalesce(Subquery(followers, output_field=IntegerField()), 0),
+        following_count=Coalesce(Subquery(following, output_field=IntegerField()), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_follow_counts, migrations.RunPython.noop),
+    ]
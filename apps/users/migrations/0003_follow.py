@@ -0,0 +1,54 @@
+# Generated by Django 2.2.28 on 2026-10-18 15:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_connections(apps, schema_editor):
+    Follow = apps.get_model('users', 'Follow')
+    FolloweeThrough = apps.get_model('users', 'Connection').followee.through
+    edges = FolloweeThrough.objects.order_by('pk').values_list('connection__user', 'user')
+    batch = []
+    for follower_id, followee_id in edges.iterator(chunk_size=1000):
+        batch.append(Follow(follower_id=follower_id, followee_id=followee_id))
+        if len(batch) == 1000:
+            Follow.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    Follow.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_follow_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Follow',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('followee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='follower_edges', to=settings.AUTH_USER_MODEL)),
+                ('follower', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='following_edges', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['followee', 'follower'], name='users_follow_followee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['follower', '-created_at'], name='users_follow_follower_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['followee', '-created_at'], name='users_follow_followee_ts_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('follower', 'followee'), name='users_follow_uniq'),
+        ),
+        migrations.RunPython(copy_connections, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 2.2.28 on 2026-10-18 15:53
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_follow'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='Connection',
+        ),
+    ]
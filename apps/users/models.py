@@ -1,14 +1,85 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import F
+
+from .cache import forget_profile_summaries, forget_users
 
 
 class User(AbstractUser):
     email = models.EmailField('メールアドレス', unique=True)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+
+class FollowManager(models.Manager):
+
+    @property
+    def write_db(self):
+        return self._db or router.db_for_write(self.model)
+
+    def _shift_counts(self, db, follower, followee, delta):
+        User.objects.using(db).filter(pk=follower.pk).update(following_count=F('following_count') + delta)
+        User.objects.using(db).filter(pk=followee.pk).update(followers_count=F('followers_count') + delta)
+        # update() skips post_save; cached request users and profile
+        # summaries carry these counts. Forget them only once the change is
+        # committed, or a concurrent read could cache the old counts again.
+        pks = [follower.pk, followee.pk]
+
+        def forget():
+            forget_users(pks)
+            forget_profile_summaries(pks)
+
+        transaction.on_commit(forget, using=db)
+
+    def follow(self, follower, followee):
+        db = self.write_db
+        with transaction.atomic(using=db):
+            _, created = self.using(db).get_or_create(follower=follower, followee=followee)
+            if created:
+                self._shift_counts(db, follower, followee, 1)
+        return created
+
+    def unfollow(self, follower, followee):
+        db = self.write_db
+        with transaction.atomic(using=db):
+            deleted, _ = self.using(db).filter(follower=follower, followee=followee).delete()
+            if deleted:
+                self._shift_counts(db, follower, followee, -deleted)
+        return bool(deleted)
+
+    def is_following(self, viewer, user_pks):
+        """
+        Return the pks among ``user_pks`` that ``viewer`` follows, in one
+        lookup on the (follower, followee) index.
+        """
+        user_pks = list(user_pks)
+        if not user_pks:
+            return set()
+        return set(self.filter(follower=viewer, followee__in=user_pks).values_list('followee', flat=True))
+
+    def mutual_follows(self, user):
+        return User.objects.filter(follower_edges__follower=user, following_edges__followee=user)
+
+    def followers_you_know(self, viewer, user):
+        return User.objects.filter(following_edges__followee=user, follower_edges__follower=viewer)
+
+
+class Follow(models.Model):
+    follower = models.ForeignKey(User, on_delete=models.CASCADE, related_name='following_edges')
+    followee = models.ForeignKey(User, on_delete=models.CASCADE, related_name='follower_edges')
+    created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = FollowManager()
 
-class Connection(models.Model):
-    user = models.OneToOneField(User, on_delete=models.CASCADE)
-    followee = models.ManyToManyField(User, related_name='follower', blank=True)
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['follower', 'followee'], name='users_follow_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['followee', 'follower'], name='users_follow_followee_idx'),
+            models.Index(fields=['follower', '-created_at'], name='users_follow_follower_ts_idx'),
+            models.Index(fields=['followee', '-created_at'], name='users_follow_followee_ts_idx'),
+        ]
 
     def __str__(self):
-       return self.user.username
+        return '{} -> {}'.format(self.follower.username, self.followee.username)
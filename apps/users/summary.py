@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+
+from .cache import profile_pk_key, profile_summary_key
+from .models import Follow, User
+
+SUMMARY_FIELDS = ('pk', 'username', 'followers_count', 'following_count')
+
+
+class ProfileSummary:
+    """
+    The header of a profile page: who the user is and their follow counts.
+    One cached record per user pk, dropped when the user is saved or
+    deleted and when a follow changes either count, plus a username to pk
+    entry. A record whose username no longer matches counts as a miss, so
+    a renamed user's old name stops resolving.
+    """
+
+    def __init__(self, pk, username, followers_count, following_count):
+        self.pk = pk
+        self.username = username
+        self.followers_count = followers_count
+        self.following_count = following_count
+
+    @classmethod
+    def get(cls, username):
+        pk = cache.get(profile_pk_key(username))
+        row = None if pk is None else cache.get(profile_summary_key(pk))
+        if row is None or row['username'] != username:
+            row = User.objects.filter(username=username).values(*SUMMARY_FIELDS).first()
+            if row is None:
+                raise Http404('No user named {!r}.'.format(username))
+            cache.set_many(
+                {profile_pk_key(username): row['pk'], profile_summary_key(row['pk']): row},
+                settings.PROFILE_SUMMARY_CACHE_TIMEOUT,
+            )
+        return cls(**row)
+
+    def is_followed_by(self, viewer):
+        return self.pk in Follow.objects.is_following(viewer, [self.pk])
@@ -1,10 +1,25 @@
-from django.contrib.auth import get_user_model
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import BACKEND_SESSION_KEY, get_user_model
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
 from django.contrib.messages import get_messages
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import Http404
+from django.db import connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from apps.tweet.models import Post
-from apps.users.models import Connection
+from apps.jobs.queue import run_pending
+from apps.perf.models import RequestProfile
+from apps.tweet.models import Post, TimelineEntry
+from apps.users.backends import CachedModelBackend
+from apps.users.cache import profile_summary_key
+from apps.users.models import Follow
+from apps.users.summary import ProfileSummary
+from twitter_clone.routers import PIN_COOKIE
 
 User = get_user_model()
 
@@ -121,6 +136,78 @@ class LogoutTests(TestCase):
         self.assertRedirects(response, reverse('apps.users:login'))
 
 
+class CachedUserTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('foo', 'foo@example.com', 'testpassword')
+        self.other = User.objects.create_user('bar', 'bar@example.com', 'testpassword')
+        self.backend = CachedModelBackend()
+
+    def test_get_user_is_cached(self):
+        with self.assertNumQueries(1):
+            self.backend.get_user(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.backend.get_user(self.user.pk), self.user)
+
+    def test_save_invalidates(self):
+        self.backend.get_user(self.user.pk)
+        self.user.first_name = 'Foo'
+        self.user.save()
+        self.assertEqual(self.backend.get_user(self.user.pk).first_name, 'Foo')
+
+    def test_delete_invalidates(self):
+        self.backend.get_user(self.user.pk)
+        self.user.delete()
+        self.assertIsNone(self.backend.get_user(self.user.pk))
+
+    def test_inactive_user_not_returned(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(self.backend.get_user(self.user.pk))
+
+    def test_login_records_cached_backend(self):
+        self.client.login(username='foo', password='testpassword')
+        self.assertEqual(self.client.session[BACKEND_SESSION_KEY], 'apps.users.backends.CachedModelBackend')
+
+    def test_model_backend_session_still_valid(self):
+        self.client.force_login(self.user, backend='django.contrib.auth.backends.ModelBackend')
+        response = self.client.get(reverse('apps.users:home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['user'], self.user)
+
+    def test_failed_login_hashes_once(self):
+        hashed = mock.patch.object(
+            PBKDF2PasswordHasher, 'encode', autospec=True, side_effect=PBKDF2PasswordHasher.encode,
+        )
+        for username in ('foo', 'nobody'):
+            with hashed as encode:
+                self.assertFalse(self.client.login(username=username, password='wrong'))
+            self.assertEqual(encode.call_count, 1)
+        with hashed as encode:
+            self.assertTrue(self.client.login(username='foo', password='testpassword'))
+        self.assertEqual(encode.call_count, 1)
+
+    def test_request_skips_user_query(self):
+        self.client.login(username='foo', password='testpassword')
+        self.client.get(reverse('apps.users:home'))
+        with CaptureQueriesContext(connections['default']) as queries:
+            self.client.get(reverse('apps.users:home'))
+        self.assertFalse(any('FROM "users_user" WHERE' in query['sql'] for query in queries))
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+    def test_cached_db_sessions(self):
+        self.client.login(username='foo', password='testpassword')
+        self.client.get(reverse('apps.users:home'))
+        with CaptureQueriesContext(connections['default']) as queries:
+            response = self.client.get(reverse('apps.users:home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any('django_session' in query['sql'] for query in queries))
+        self.client.get(reverse('apps.users:logout'))
+        response = self.client.get(reverse('apps.users:home'))
+        self.assertEqual(response.status_code, 302)
+
+
 class FollowTests(TestCase):
     
     def setUp(self):
@@ -133,8 +220,7 @@ class FollowTests(TestCase):
         self.client.login(username='foo1', password='testpassword')
         response = self.client.get(self.url2)
         self.assertRedirects(response, reverse('apps.users:profile', kwargs={'username': self.user2.username}))
-        following = Connection.objects.filter(user=self.user1).values_list('followee')
-        following_list = User.objects.filter(id__in=following)
+        following_list = User.objects.filter(follower_edges__follower=self.user1)
         for following in following_list:
             self.assertEqual(following.username, 'foo2')
     
@@ -142,10 +228,32 @@ class FollowTests(TestCase):
         self.client.login(username='foo1', password='testpassword')
         self.client.get(self.url2)
         self.client.get(self.url2)
-        following = Connection.objects.filter(user=self.user1).values_list('followee')
-        following_list = User.objects.filter(id__in=following).count()
+        following_list = Follow.objects.filter(follower=self.user1).count()
         self.assertEqual(following_list, 0)
 
+    def test_follow_backfills_timeline(self):
+        tweet = Post.objects.create(title='test', content='test', user=self.user2)
+        self.client.login(username='foo1', password='testpassword')
+        self.client.get(self.url2)
+        self.assertTrue(TimelineEntry.objects.filter(owner=self.user1, post=tweet).exists())
+        self.client.get(self.url2)
+        self.assertFalse(TimelineEntry.objects.filter(owner=self.user1, post=tweet).exists())
+
+    @override_settings(JOB_QUEUE_ENABLED=True)
+    def test_queued_follow_sync_follows_current_state(self):
+        tweet = Post.objects.create(title='test', content='test', user=self.user2)
+        self.client.login(username='foo1', password='testpassword')
+        self.client.get(self.url2)
+        self.assertFalse(TimelineEntry.objects.filter(owner=self.user1, post=tweet).exists())
+        run_pending()
+        self.assertTrue(TimelineEntry.objects.filter(owner=self.user1, post=tweet).exists())
+        # Toggles queued back to back settle on the final state.
+        self.client.get(self.url2)
+        self.client.get(self.url2)
+        self.client.get(self.url2)
+        run_pending()
+        self.assertFalse(TimelineEntry.objects.filter(owner=self.user1, post=tweet).exists())
+
     def test_follow_failure_by_common_user(self):
         self.client.login(username='foo1', password='testpassword')
         response = self.client.get(self.url1)
@@ -153,8 +261,7 @@ class FollowTests(TestCase):
         messages = list(get_messages(response.wsgi_request))
         message = str(messages[0])
         self.assertEqual(message, '自分をフォローすることはできません')
-        following = Connection.objects.filter(user=self.user1).values_list('followee')
-        following_list = User.objects.filter(id__in=following).count()
+        following_list = Follow.objects.filter(follower=self.user1).count()
         self.assertEqual(following_list, 0)
 
 
@@ -188,10 +295,77 @@ class FollowingAndFollowersListTest(TestCase):
         self.assertTemplateUsed(response, 'users/profile/followers_list.html')
         self.assertQuerysetEqual(
             response.context['followers_list'],
-            ['<Connection: foo2>'], 
+            ['<User: foo2>'], 
         )
         self.assertContains(response, self.user2.username)
 
+    def test_followers_list_paginated(self):
+        for i in range(3, 6):
+            user = User.objects.create_user('foo{}'.format(i), 'foo{}@example.com'.format(i), 'testpassword')
+            Follow.objects.follow(user, self.user1)
+        self.client.login(username='foo1', password='testpassword')
+        with override_settings(FOLLOW_LIST_PAGE_SIZE=2):
+            response = self.client.get(self.url2, {'page': 2})
+        self.assertEquals(response.status_code, 200)
+        self.assertEqual(response.context['paginator'].count, 4)
+        self.assertEqual(len(response.context['followers_list']), 2)
+
+
+class FollowCountTests(TestCase):
+
+    def setUp(self):
+        self.user1 = User.objects.create_user('foo1', 'foo1@example.com', 'testpassword')
+        self.user2 = User.objects.create_user('foo2', 'foo2@example.com', 'testpassword')
+        self.user3 = User.objects.create_user('foo3', 'foo3@example.com', 'testpassword')
+
+    def assertCounts(self, user, followers_count, following_count):
+        user.refresh_from_db()
+        self.assertEqual((user.followers_count, user.following_count), (followers_count, following_count))
+
+    def test_follow_and_unfollow(self):
+        self.assertTrue(Follow.objects.follow(self.user1, self.user2))
+        self.assertFalse(Follow.objects.follow(self.user1, self.user2))
+        Follow.objects.follow(self.user1, self.user3)
+        self.assertCounts(self.user1, 0, 2)
+        self.assertCounts(self.user2, 1, 0)
+        self.assertTrue(Follow.objects.unfollow(self.user1, self.user2))
+        self.assertFalse(Follow.objects.unfollow(self.user1, self.user2))
+        self.assertCounts(self.user1, 0, 1)
+        self.assertCounts(self.user2, 0, 0)
+
+    def test_reconcile_follow_counts(self):
+        Follow.objects.follow(self.user1, self.user2)
+        User.objects.update(followers_count=7, following_count=7)
+        out = StringIO()
+        call_command('reconcile_follow_counts', stdout=out)
+        self.assertIn('3 users', out.getvalue())
+        self.assertCounts(self.user1, 0, 1)
+        self.assertCounts(self.user2, 1, 0)
+        self.assertCounts(self.user3, 0, 0)
+
+
+class FollowGraphTests(TestCase):
+
+    def setUp(self):
+        self.user1 = User.objects.create_user('foo1', 'foo1@example.com', 'testpassword')
+        self.user2 = User.objects.create_user('foo2', 'foo2@example.com', 'testpassword')
+        self.user3 = User.objects.create_user('foo3', 'foo3@example.com', 'testpassword')
+        Follow.objects.follow(self.user1, self.user2)
+        Follow.objects.follow(self.user2, self.user1)
+        Follow.objects.follow(self.user1, self.user3)
+        Follow.objects.follow(self.user3, self.user2)
+
+    def test_is_following(self):
+        with self.assertNumQueries(1):
+            following = Follow.objects.is_following(self.user1, [self.user2.pk, self.user3.pk, self.user1.pk])
+        self.assertEqual(following, {self.user2.pk, self.user3.pk})
+
+    def test_mutual_follows(self):
+        self.assertQuerysetEqual(Follow.objects.mutual_follows(self.user1), ['<User: foo2>'])
+
+    def test_followers_you_know(self):
+        self.assertQuerysetEqual(Follow.objects.followers_you_know(self.user1, self.user2), ['<User: foo3>'])
+
 
 class UserProfileTest(TestCase):
         
@@ -222,9 +396,7 @@ class UserProfileTest(TestCase):
         self.assertContains(response, self.tweet1.title)
         self.assertEqual(response.context['following_count'], 1)
         self.assertEqual(response.context['followers_count'], 1)
-        request_user_following_list = response.context['request_user_following_list']
-        for request_user_following in request_user_following_list:
-            self.assertEqual(request_user_following.username, 'foo2')
+        self.assertFalse(response.context['is_following'])
     
     def test_user2_profile_get(self):
         self.client.login(username='foo1', password='testpassword')
@@ -241,4 +413,147 @@ class UserProfileTest(TestCase):
         self.assertContains(response, self.tweet2.title)
         self.assertEqual(response.context['following_count'], 1)
         self.assertEqual(response.context['followers_count'], 1)
+        self.assertTrue(response.context['is_following'])
+
+
+
+class ProfileSummaryTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user1 = User.objects.create_user('foo1', 'foo1@example.com', 'testpassword')
+        self.user2 = User.objects.create_user('foo2', 'foo2@example.com', 'testpassword')
+
+    def test_summary_is_cached(self):
+        with self.assertNumQueries(1):
+            summary = ProfileSummary.get('foo2')
+        with self.assertNumQueries(0):
+            summary = ProfileSummary.get('foo2')
+        self.assertEqual((summary.pk, summary.username), (self.user2.pk, 'foo2'))
+        self.assertEqual((summary.followers_count, summary.following_count), (0, 0))
+
+    def test_delete_invalidates(self):
+        ProfileSummary.get('foo2')
+        self.user2.delete()
+        with self.assertRaises(Http404):
+            ProfileSummary.get('foo2')
+
+    def test_rename_invalidates_old_username(self):
+        ProfileSummary.get('foo2')
+        self.user2.username = 'foo3'
+        self.user2.save()
+        self.assertEqual(ProfileSummary.get('foo3').pk, self.user2.pk)
+        with self.assertRaises(Http404):
+            ProfileSummary.get('foo2')
+        user = User.objects.create_user('foo2', 'new@example.com', 'testpassword')
+        self.assertEqual(ProfileSummary.get('foo2').pk, user.pk)
+        self.assertEqual(ProfileSummary.get('foo3').pk, self.user2.pk)
+
+    def test_unknown_user_profile(self):
+        self.client.login(username='foo1', password='testpassword')
+        response = self.client.get(reverse('apps.users:profile', kwargs={'username': 'nobody'}))
+        self.assertEqual(response.status_code, 404)
+
+
+class FollowCacheInvalidationTests(TransactionTestCase):
+    """Follow counts are forgotten on commit, which TestCase never reaches."""
+
+    def setUp(self):
+        cache.clear()
+        self.user1 = User.objects.create_user('foo1', 'foo1@example.com', 'testpassword')
+        self.user2 = User.objects.create_user('foo2', 'foo2@example.com', 'testpassword')
+
+    def test_follow_counts_invalidate(self):
+        backend = CachedModelBackend()
+        backend.get_user(self.user1.pk)
+        Follow.objects.follow(self.user1, self.user2)
+        self.assertEqual(backend.get_user(self.user1.pk).following_count, 1)
+
+    def test_follow_invalidates_both_users(self):
+        ProfileSummary.get('foo1')
+        ProfileSummary.get('foo2')
+        Follow.objects.follow(self.user1, self.user2)
+        self.assertEqual(ProfileSummary.get('foo1').following_count, 1)
+        self.assertEqual(ProfileSummary.get('foo2').followers_count, 1)
+        self.assertTrue(ProfileSummary.get('foo2').is_followed_by(self.user1))
+        Follow.objects.unfollow(self.user1, self.user2)
+        self.assertEqual(ProfileSummary.get('foo2').followers_count, 0)
+        self.assertFalse(ProfileSummary.get('foo2').is_followed_by(self.user1))
+
+    def test_counts_cached_before_commit_are_forgotten(self):
+        with transaction.atomic():
+            Follow.objects.follow(self.user1, self.user2)
+            # A concurrent request still sees the old counts and caches them.
+            ProfileSummary.get('foo2')
+            cache.set(profile_summary_key(self.user2.pk), dict(
+                pk=self.user2.pk, username='foo2', followers_count=0, following_count=0,
+            ))
+        self.assertEqual(ProfileSummary.get('foo2').followers_count, 1)
+
+
+class UserProfileQueryBudgetTest(TestCase):
+
+    def setUp(self):
+        self.user1 = User.objects.create_user('foo1', 'foo1@example.com', 'testpassword')
+        self.user2 = User.objects.create_user('foo2', 'foo2@example.com', 'testpassword')
+        self.client.login(username='foo1', password='testpassword')
+        self.url = reverse('apps.users:profile', kwargs={'username': self.user2.username})
+
+    def test_profile_query_budget(self):
+        # Budgets are for a warm authenticated-user cache.
+        self.client.get(self.url)
+        for count in (1, 5):
+            for i in range(count):
+                Post.objects.create(title='test{}'.format(i), content='test', user=self.user2)
+            with self.assertNumQueries(3):
+                response = self.client.get(self.url)
+            self.assertEquals(response.status_code, 200)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.user = User.objects.create_user('foo', 'foo@example.com', 'testpassword')
+        self.tweet = Post.objects.create(title='test', content='test', user=self.user)
+        self.client.login(username='foo', password='testpassword')
+        self.client.cookies.pop(PIN_COOKIE, None)
+        self.profile_url = reverse('apps.users:profile', kwargs={'username': 'foo'})
+
+    def get_profile(self):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get(self.profile_url)
+        self.assertEqual(response.status_code, 200)
+        return len(primary), len(replica)
+
+    def test_read_views_use_replica(self):
+        primary, replica = self.get_profile()
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_writes_pin_client_to_primary(self):
+        response = self.client.post(reverse('apps.users:like', kwargs={'pk': self.tweet.pk}))
+        self.assertIn(PIN_COOKIE, response.cookies)
+        primary, replica = self.get_profile()
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_write_during_get_pins_client(self):
+        other = User.objects.create_user('bar', 'bar@example.com', 'testpassword')
+        response = self.client.get(reverse('apps.users:follow_in_profile', kwargs={'pk': other.pk}))
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    @override_settings(PERF_SAMPLE_RATE=1, PERF_FLUSH_SIZE=1)
+    def test_profiling_flush_does_not_pin_client(self):
+        response = self.client.get(reverse('apps.users:home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        self.assertTrue(RequestProfile.objects.exists())
 
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas_configured(self):
+        primary, replica = self.get_profile()
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
@@ -1,14 +1,22 @@
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import transaction
+from django.http import HttpResponseBadRequest
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse, reverse_lazy
 from django.views import View
 from django.views.generic import CreateView, ListView
 
-from apps.tweet.models import Like, Post
+from apps.jobs.queue import enqueue
+from apps.tweet.models import Post
+from apps.tweet.pagination import CountedPaginator, InvalidCursor, paginate_keyset, stream_keyset
+from apps.tweet.streaming import stream_cards
+from apps.tweet.tasks import sync_followed_author
 
 from .forms import SignUpForm
-from .models import Connection, User
+from .models import Follow, User
+from .summary import ProfileSummary
 
 
 class SignUpView(CreateView):
@@ -18,40 +26,46 @@ class SignUpView(CreateView):
 
 
 class UserProfileView(LoginRequiredMixin, View):
+    replica_reads = True
   
     def get(self, request, *args, **kwargs):
-        user_data = get_object_or_404(User, username=self.kwargs['username'])
-        post_data = Post.objects.filter(user__username=self.kwargs['username'])
-        following_data =  Connection.objects.filter(user=user_data).values_list('followee')
-        following_count = User.objects.filter(id__in=following_data).count()
-        followers_data = user_data.follower.all()
-        followers_count = followers_data.count()
-        request_user_following_data = Connection.objects.filter(user=self.request.user).values_list('followee')
-        request_user_following_list = User.objects.filter(id__in=request_user_following_data) 
-        liked_post_pk_list = Like.objects.filter(user=self.request.user).values_list('post', flat=True)
+        user_data = ProfileSummary.get(self.kwargs['username'])
+        posts = Post.objects.for_feed(self.request.user).filter(user=user_data.pk)
+        try:
+            if settings.STREAMING_PAGES_ENABLED:
+                posts, next_cursor = stream_keyset(
+                    posts, request.GET.get('cursor'), settings.STREAMING_PAGE_SIZE, settings.STREAMING_CHUNK_SIZE
+                )
+                post_data = []
+            else:
+                post_data, next_cursor = paginate_keyset(posts, request.GET.get('cursor'))
+        except InvalidCursor:
+            return HttpResponseBadRequest()
         context = {
         'user_data':user_data, 
         'post_data':post_data, 
-        'following_count':following_count, 
-        'followers_count':followers_count, 
-        'request_user_following_list':request_user_following_list,
-        'liked_post_pk_list': liked_post_pk_list,
+        'following_count':user_data.following_count, 
+        'followers_count':user_data.followers_count, 
+        'is_following':user_data.is_followed_by(self.request.user),
+        'next_cursor': next_cursor,
         }
+        if settings.STREAMING_PAGES_ENABLED:
+            return stream_cards(request, 'users/profile/profile.html', context, posts, show_author=False)
         return render(request, 'users/profile/profile.html', context)
 
 
 class FollowBase(LoginRequiredMixin, View):
 
+    @transaction.atomic
     def get(self, request, *args, **kwargs):
-        follower = Connection.objects.get_or_create(user=self.request.user)
         followee = get_object_or_404(User, pk=self.kwargs['pk'])
     
-        if follower[0].user.username == followee.username:
+        if self.request.user == followee:
             messages.error(request, '自分をフォローすることはできません') 
-        elif follower[0].followee.filter(pk=self.kwargs['pk']).exists():
-            follower[0].followee.remove(followee)
         else:
-            follower[0].followee.add(followee)
+            if not Follow.objects.unfollow(self.request.user, followee):
+                Follow.objects.follow(self.request.user, followee)
+            enqueue(sync_followed_author, owner_pk=self.request.user.pk, author_pk=followee.pk)
 
 
 class FollowInUserProfile(FollowBase):
@@ -63,22 +77,32 @@ class FollowInUserProfile(FollowBase):
 
 
 class FollowingListView(LoginRequiredMixin, ListView):
-    model = Connection
     template_name = 'users/profile/following_list.html'
+    context_object_name = 'following_list'
+    replica_reads = True
 
-    def get_context_data(self, *args, **kwargs):
-        context = super().get_context_data(*args, **kwargs)
-        user =  get_object_or_404(User, username=self.kwargs['username'])
-        following = Connection.objects.filter(user=user).values_list('followee')
-        context['following_list'] = User.objects.filter(id__in=following)
-        return context
+    def get_paginate_by(self, queryset):
+        return settings.FOLLOW_LIST_PAGE_SIZE
+
+    def get_queryset(self):
+        self.user = ProfileSummary.get(self.kwargs['username'])
+        return User.objects.filter(follower_edges__follower=self.user.pk).order_by('-follower_edges__created_at')
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        return CountedPaginator(queryset, per_page, self.user.following_count, **kwargs)
 
 
 class FollowersListView(LoginRequiredMixin, ListView):
-    model = Connection
     template_name = 'users/profile/followers_list.html'
+    context_object_name = 'followers_list'
+    replica_reads = True
+
+    def get_paginate_by(self, queryset):
+        return settings.FOLLOW_LIST_PAGE_SIZE
+
+    def get_queryset(self):
+        self.user = ProfileSummary.get(self.kwargs['username'])
+        return User.objects.filter(following_edges__followee=self.user.pk).order_by('-following_edges__created_at')
 
-    def get_context_data(self, *args, **kwargs):
-        context = super().get_context_data(*args, **kwargs)
-        context['followers_list'] = get_object_or_404(User, username=self.kwargs['username']).follower.all()
-        return context
+    def get_paginator(self, queryset, per_page, **kwargs):
+        return CountedPaginator(queryset, per_page, self.user.followers_count, **kwargs)
@@ -0,0 +1,70 @@
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = 'primary_pin'
+SAFE_METHODS = ('GET', 'HEAD')
+
+_state = threading.local()
+
+
+class ReplicaRouter:
+    """
+    Send reads to the replica picked for the current request, if any, and
+    everything else to the primary. Outside ``ReplicaRoutingMiddleware``
+    (management commands, tests, views that do not opt in) no replica is
+    picked, so all queries use the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        return getattr(_state, 'replica', None) or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Reads after a write in the same request must see it.
+        _state.replica = None
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Route reads of views that set ``replica_reads = True`` to one of
+    ``DATABASE_REPLICAS`` for safe requests. A request that writes pins
+    the client to the primary for ``READ_YOUR_WRITES_WINDOW`` seconds with
+    a cookie, so it does not read stale data while replicas catch up.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.replica = None
+        _state.wrote = False
+        try:
+            response = self.get_response(request)
+            wrote = _state.wrote or request.method not in SAFE_METHODS
+        finally:
+            _state.replica = None
+            _state.wrote = False
+        if wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.READ_YOUR_WRITES_WINDOW, httponly=True)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = getattr(view_func, 'view_class', view_func)
+        if (
+            settings.DATABASE_REPLICAS
+            and getattr(view, 'replica_reads', False)
+            and request.method in SAFE_METHODS
+            and PIN_COOKIE not in request.COOKIES
+        ):
+            _state.replica = random.choice(settings.DATABASE_REPLICAS)
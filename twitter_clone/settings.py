@@ -33,6 +33,9 @@ ALLOWED_HOSTS = ['127.0.0.1', '.pythonanywhere.com']
 INSTALLED_APPS = [
     'apps.users',
     'apps.tweet',
+    'apps.perf',
+    'apps.api',
+    'apps.jobs',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -44,12 +47,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'twitter_clone.routers.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apps.perf.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'twitter_clone.urls'
@@ -82,12 +87,91 @@ NOSE_ARGS = [
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
 DATABASES = {
+    # twitter_clone.sqlite_backend applies WAL and the other pragmas in
+    # its DEFAULT_PRAGMAS; override them with OPTIONS['pragmas'].
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'twitter_clone.sqlite_backend',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', '60')),
+        # A file rather than the in-memory default, so tests that run the
+        # job worker's thread pool get WAL and busy_timeout like production
+        # instead of 'database table is locked'.
+        'TEST': {
+            'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3'),
+        },
+    },
+    # Read replica used by twitter_clone.routers. To try it locally, copy
+    # db.sqlite3 and point DATABASE_REPLICA_NAME at the copy.
+    'replica': {
+        'ENGINE': 'twitter_clone.sqlite_backend',
+        'NAME': os.environ.get('DATABASE_REPLICA_NAME', os.path.join(BASE_DIR, 'db.sqlite3')),
+        'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', '60')),
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
+}
+
+DATABASE_ROUTERS = ['twitter_clone.routers.ReplicaRouter']
+
+# Aliases that views with replica_reads = True may read from.
+DATABASE_REPLICAS = ['replica'] if os.environ.get('DATABASE_REPLICA_NAME') else []
+
+# Seconds a client keeps reading from the primary after it writes.
+READ_YOUR_WRITES_WINDOW = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+# Tweet cards default to a per-process locmem cache; point
+# TWEET_CARD_CACHE_BACKEND/LOCATION at a file or memcached cache in production.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'tweet_cards': {
+        'BACKEND': os.environ.get('TWEET_CARD_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('TWEET_CARD_CACHE_LOCATION', 'tweet_cards'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    'sessions': {
+        'BACKEND': os.environ.get('SESSION_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('SESSION_CACHE_LOCATION', 'sessions'),
+    },
 }
 
+TWEET_CARD_CACHE = 'tweet_cards'
+TWEET_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+TWEET_CARD_CACHE_STATS = True
+
+
+# Sessions and authentication
+# SESSION_ENGINE=django.contrib.sessions.backends.cached_db reads sessions
+# from the 'sessions' cache and writes them through to the database. With
+# more than one process, point SESSION_CACHE_BACKEND/LOCATION at a shared
+# cache, or a logout in one process is not seen by the others.
+
+SESSION_ENGINE = os.environ.get('SESSION_ENGINE', 'django.contrib.sessions.backends.db')
+SESSION_CACHE_ALIAS = 'sessions'
+
+# ModelBackend stays listed so sessions logged in before CachedModelBackend
+# existed (they record the backend's path) remain valid. It never checks a
+# password: CachedModelBackend handles every login attempt and stops the
+# chain when one fails.
+AUTHENTICATION_BACKENDS = [
+    'apps.users.backends.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+# Seconds the logged-in user is cached between requests; see apps.users.backends.
+AUTH_USER_CACHE_TIMEOUT = 30
+
+# Seconds a profile header (apps.users.summary.ProfileSummary) is cached.
+PROFILE_SUMMARY_CACHE_TIMEOUT = 300
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -132,3 +216,56 @@ LOGIN_REDIRECT_URL = 'apps.users:home'
 LOGOUT_REDIRECT_URL = 'apps.users:login'
 
 AUTH_USER_MODEL = 'users.User'
+
+TIMELINE_PAGE_SIZE = 20
+# Authors with more followers than this are merged into timelines at read
+# time instead of being fanned out on write.
+TIMELINE_FANOUT_THRESHOLD = 10000
+TIMELINE_FANOUT_BATCH_SIZE = 1000
+TIMELINE_BACKFILL_SIZE = 100
+
+# Stream the home and profile pages card by card (apps.tweet.streaming)
+# instead of rendering them whole, so much longer pages stay cheap.
+STREAMING_PAGES_ENABLED = os.environ.get('STREAMING_PAGES_ENABLED') == '1'
+STREAMING_PAGE_SIZE = 500
+STREAMING_CHUNK_SIZE = 100
+
+FOLLOW_LIST_PAGE_SIZE = 50
+
+# Longest a timeline "since" poll (apps.api) waits for new posts. Each
+# waiting poll holds a worker thread.
+LONG_POLL_TIMEOUT = 25
+# Seconds between timeline checks while a poll waits; posts fanned out in
+# another process (the job worker) are only seen this way.
+LONG_POLL_INTERVAL = 1
+
+# Buffer like/unlike toggles in memory and write them in batches
+# (apps.tweet.likebuffer) instead of one transaction per click.
+LIKE_BUFFER_ENABLED = os.environ.get('LIKE_BUFFER_ENABLED') == '1'
+LIKE_BUFFER_FLUSH_INTERVAL = 0.005
+LIKE_BUFFER_MAX_PENDING = 1000
+
+# Post-write side effects (fan-out, timeline backfill, search indexing) go
+# through apps.jobs. With JOB_QUEUE_ENABLED=1 they are queued for
+# `manage.py run_worker`; otherwise they run inline in the request.
+JOB_QUEUE_ENABLED = os.environ.get('JOB_QUEUE_ENABLED') == '1'
+JOB_BATCH_SIZE = 20
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BACKOFF = 10
+# Seconds a claimed job stays hidden from other workers.
+JOB_LEASE = 300
+JOB_POLL_INTERVAL = 1.0
+
+# Trending scores halve every TRENDING_HALF_LIFE seconds; see apps.tweet.trending.
+TRENDING_HALF_LIFE = 6 * 60 * 60
+TRENDING_CANDIDATES = 1000
+TRENDING_MIN_SCORE = 0.01
+TRENDING_CACHE_TIMEOUT = 300
+
+SEARCH_BACKEND = 'apps.tweet.search.SqliteFTS5Backend'
+SEARCH_PAGE_SIZE = 20
+SEARCH_INDEX_BATCH_SIZE = 500
+
+# Fraction of requests profiled by apps.perf.middleware.ProfilingMiddleware.
+PERF_SAMPLE_RATE = float(os.environ.get('PERF_SAMPLE_RATE', '0'))
+PERF_FLUSH_SIZE = 50